@@ -5,17 +5,24 @@ class AFD:
     Represents a Deterministic Finite Automaton (DFA).
 
     Attributes:
-        start_state (frozenset): The starting state of the DFA.
-        accept_states (set of frozenset): The set of accepting states.
-        transitions (dict): A dictionary mapping a state (frozenset) to a dictionary 
-                            of input symbols to destination states (frozenset).
-        token_map (dict): A mapping from accepting states to their associated token types.
+        start_state (int): The starting state of the DFA. States are integer ids 0..N-1,
+                           assigned in order of discovery, and every state has an
+                           entry in 'transitions' (possibly empty).
+        accept_states (set): The set of accepting states.
+        transitions (dict): A dictionary mapping a state to a dictionary of input
+                            symbols (disjoint CharSets) to destination states.
+        token_map (dict): A mapping from accepting states to their resolved token type
+                          (at most one per state, already resolved by rule priority).
+        compiled (tuple | None): The (token_map, CompiledAFD) pair cached by
+                                 compile_automaton, which assumes the DFA is no longer
+                                 modified once it is run.
     """
     def __init__(self, start_state, accept_states, transitions, token_map=None):
         self.start_state = start_state
         self.accept_states = accept_states
-        self.transitions = transitions  # Dict[frozenset, Dict[symbol, frozenset]]
+        self.transitions = transitions  # Dict[int, Dict[CharSet, int]]
         self.token_map = token_map or {}
+        self.compiled = None
 
     def __str__(self):
         """
@@ -28,7 +35,7 @@ class AFD:
         lines.append("Transitions:")
         for state, trans in self.transitions.items():
             for symbol, target in trans.items():
-                lines.append(f"  {set(state)} -- {symbol} --> {set(target)}")
+                lines.append(f"  {state} -- {symbol} --> {target}")
         return "\n".join(lines)
 
     def export_to_txt(self, filename):
@@ -42,42 +49,27 @@ class AFD:
             - Alphabet symbols
             - Transitions in the form "source_id,symbol,target_id"
 
-        States are assigned numeric IDs starting from 0.
+        State IDs are written as they are (see the class attributes). Symbols are character
+        sets written in their compact text form (e.g. "65-90;97-122", see CharSet.to_text).
         Args:
             filename (str): Path to the output file where the DFA will be written.
         """
-        state_id_map = {}
-        current_id = 0
-
-        # Assign unique numeric IDs to each state
-        for state in self.transitions:
-            if state not in state_id_map:
-                state_id_map[state] = current_id
-                current_id += 1
-            for target in self.transitions[state].values():
-                if target not in state_id_map:
-                    state_id_map[target] = current_id
-                    current_id += 1
-
-        num_states = len(state_id_map)
-        start_state_id = state_id_map[self.start_state]
-        accept_state_ids = sorted(state_id_map[s] for s in self.accept_states)
+        num_states = len(self.transitions)
+        accept_state_ids = sorted(self.accept_states)
         alphabet = set()
 
         # Collect transitions
         transition_lines = []
         for src, transitions in self.transitions.items():
-            src_id = state_id_map[src]
             for symbol, dst in transitions.items():
-                dst_id = state_id_map[dst]
                 alphabet.add(symbol)
-                transition_lines.append(f"{src_id},{symbol},{dst_id}")
+                transition_lines.append(f"{src},{symbol.to_text()},{dst}")
 
         # Write to file
         with open(filename, 'w') as f:
             f.write(f"{num_states}\n")
-            f.write(f"{start_state_id}\n")
+            f.write(f"{self.start_state}\n")
             f.write(','.join(map(str, accept_state_ids)) + '\n')
-            f.write(','.join(sorted(alphabet)) + '\n')
+            f.write(','.join(symbol.to_text() for symbol in sorted(alphabet)) + '\n')
             for line in transition_lines:
                 f.write(line + '\n')
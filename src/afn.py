@@ -1,4 +1,6 @@
 from collections import deque
+from char_set import CharSet, partition
+from compiled_afd import CompiledAFD
 import afd
 
 class AFN:
@@ -9,17 +11,21 @@ class AFN:
         states (set[int]): Set of all states.
         start_state (int): The start state of the AFN.
         final_states (set[int]): Set of accepting (final) states.
-        transitions (dict[int][str] -> set[int]): State transition function including ε-transitions.
-        alphabet (set[str]): Set of valid input symbols (excluding ε unless used explicitly).
+        transitions (dict[int][CharSet | str] -> set[int]): State transition function; symbols are
+                                                          CharSets, plus 'ε' for ε-transitions.
+        alphabet (set[CharSet | str]): Set of valid input symbols (excluding ε unless used explicitly).
         token_types (dict[int] -> str): Optional mapping from final states to token types.
+        token_priorities (dict[int] -> int): Optional mapping from final states to rule priorities
+                                             (lower wins), used when a DFA state matches several tokens.
     """
-    def __init__(self, states, start_state, final_states, transitions, alphabet, token_types=None):
+    def __init__(self, states, start_state, final_states, transitions, alphabet, token_types=None, token_priorities=None):
         self.states = states
         self.start_state = start_state
         self.final_states = final_states
         self.transitions = transitions
         self.alphabet = alphabet
         self.token_types = token_types or {}
+        self.token_priorities = token_priorities or {}
 
     def offset_states(self, offset):
         """
@@ -45,9 +51,49 @@ class AFN:
                 new_transitions[new_state][symbol] = {d + offset for d in destinations}
 
         new_token_types = {s + offset: t for s, t in self.token_types.items()}
-        return AFN(new_states, new_start, new_finals, new_transitions, self.alphabet, new_token_types)
+        new_token_priorities = {s + offset: p for s, p in self.token_priorities.items()}
+        return AFN(new_states, new_start, new_finals, new_transitions, self.alphabet, new_token_types, new_token_priorities)
 
 
+    @staticmethod
+    def from_afd(dfa, token_type=None):
+        """
+        Converts an AFD (as returned by syntax_tree.build_afd) into an AFN in memory.
+
+        States are renumbered from 0 (the start state) in order of discovery.
+
+        Args:
+            dfa (AFD): The automaton to convert.
+            token_type (str, optional): Token type to associate with all final states.
+
+        Returns:
+            AFN: A new AFN instance with the same language as 'dfa'.
+        """
+        state_ids = {dfa.start_state: 0}
+
+        def state_id(state):
+            if state not in state_ids:
+                state_ids[state] = len(state_ids)
+            return state_ids[state]
+
+        alphabet = set()
+        transitions = {}
+        for state, trans in dfa.transitions.items():
+            src = state_id(state)
+            for symbol, target in trans.items():
+                alphabet.add(symbol)
+                transitions.setdefault(src, {})[symbol] = {state_id(target)}
+
+        final_states = {state_id(s) for s in dfa.accept_states}
+        states = set(state_ids.values())
+
+        token_types = {}
+        if token_type:
+            for s in final_states:
+                token_types[s] = token_type
+
+        return AFN(states, 0, final_states, transitions, alphabet, token_types)
+
     @staticmethod
     def load_afd_from_file(filepath, token_type=None):
         """
@@ -65,11 +111,12 @@ class AFN:
 
         start_state = int(lines[1])
         final_states = {int(s) for s in lines[2].split(',')}
-        alphabet = set(lines[3].split(','))
+        alphabet = {CharSet.from_text(symbol) for symbol in lines[3].split(',')}
         transitions = {}
 
         for line in lines[4:]:
             src, symbol, dest = line.split(',')
+            symbol = CharSet.from_text(symbol)
             src = int(src)
             dest = int(dest)
             if src not in transitions:
@@ -90,13 +137,66 @@ class AFN:
 
         return AFN(states, start_state, final_states, transitions, alphabet, token_types)
 
+    @staticmethod
+    def load_afd_from_binary(filepath, token_type=None):
+        """
+        Loads an AFN from a file written by CompiledAFD.save_binary().
+
+        The file is memory-mapped, so no text parsing is involved (see from_compiled).
+
+        Args:
+            filepath (str): Path to the binary automaton file.
+            token_type (str, optional): Token type to associate with all final states.
+
+        Returns:
+            AFN: A new AFN instance reconstructed from the file.
+        """
+        return AFN.from_compiled(CompiledAFD.load_binary(filepath), token_type)
+
+    @staticmethod
+    def from_compiled(compiled, token_type=None):
+        """
+        Converts a CompiledAFD into an equivalent AFN: each transition table entry
+        becomes a transition labeled with the characters of its class.
+
+        Args:
+            compiled (CompiledAFD): The automaton to convert.
+            token_type (str, optional): Token type to associate with all final states.
+
+        Returns:
+            AFN: A new AFN instance with the same states (0 is the start state).
+        """
+        class_sets = compiled.class_char_sets()
+        num_classes = compiled.num_classes
+        table = compiled.table
+
+        states = set(range(compiled.num_states))
+        final_states = {s for s in states if compiled.accepting[s]}
+        alphabet = set()
+        transitions = {}
+        for src in range(compiled.num_states):
+            for class_id in range(1, num_classes):
+                dest = table[src * num_classes + class_id]
+                if dest < 0:
+                    continue
+                symbol = class_sets[class_id]
+                alphabet.add(symbol)
+                transitions.setdefault(src, {})[symbol] = {dest}
+
+        token_types = {}
+        if token_type:
+            for s in final_states:
+                token_types[s] = token_type
+
+        return AFN(states, compiled.start_state, final_states, transitions, alphabet, token_types)
+
     def __str__(self):
         """Returns a human-readable string representation of the AFN."""
         result = []
         result.append(f"States: {sorted(self.states)}")
         result.append(f"Start state: {self.start_state}")
         result.append(f"Accept states: {sorted(self.final_states)}")
-        result.append(f"Alphabet: {sorted(self.alphabet)}")
+        result.append(f"Alphabet: {sorted(self.alphabet, key=str)}")
         result.append("Transitions:")
         for state, trans_dict in self.transitions.items():
             for symbol, destinations in trans_dict.items():
@@ -111,93 +211,115 @@ class AFN:
         Returns:
             tuple:
                 - AFD: The deterministic equivalent of the current AFN.
-                - dict[int] -> str: Mapping of DFA state IDs to token types.
+                - dict[int] -> str: Mapping of each accepting DFA state ID to the token type
+                  of its highest-priority final state (see token_priorities).
+
+        DFA states are identified by integer IDs (0 is the start state), assigned as the
+        sorted tuples of NFA states they stand for are discovered. Only the symbols present
+        on each DFA state are visited, and ε-closures are memoized per NFA state and per set.
         """
+        # Labeled (non-ε) transitions of each NFA state, computed once
+        labeled = {
+            state: [(symbol, dests) for symbol, dests in trans.items() if symbol != 'ε']
+            for state, trans in self.transitions.items()
+        }
+        state_closures = {}  # NFA state -> ε-closure (frozenset)
+        set_closures = {}  # sorted tuple of NFA states -> ε-closure (sorted tuple)
+
+        def state_closure(state):
+            """Compute (once) the epsilon-closure of a single state."""
+            closure = state_closures.get(state)
+            if closure is None:
+                closure = {state}
+                stack = [state]
+                while stack:
+                    current = stack.pop()
+                    for dest in self.transitions.get(current, {}).get('ε', ()):
+                        if dest not in closure:
+                            closure.add(dest)
+                            stack.append(dest)
+                closure = frozenset(closure)
+                state_closures[state] = closure
+            return closure
+
         def epsilon_closure(states):
-            """Compute the epsilon-closure of a set of states."""
-            closure = set(states)
-            stack = list(states)
-            while stack:
-                state = stack.pop()
-                for dest in self.transitions.get(state, {}).get('ε', set()):
-                    if dest not in closure:
-                        closure.add(dest)
-                        stack.append(dest)
+            """Compute the epsilon-closure of a sorted tuple of states, as a sorted tuple."""
+            closure = set_closures.get(states)
+            if closure is None:
+                result = set()
+                for state in states:
+                    result |= state_closure(state)
+                closure = tuple(sorted(result))
+                set_closures[states] = closure
             return closure
 
-        def move(states, symbol):
-            """Compute the set of states reachable from 'states' via 'symbol'."""
-            result = set()
+        def moves(states):
+            """
+            Compute the moves out of 'states' over disjoint character ranges.
+
+            Only the labels actually present on 'states' are visited. Yields
+            (CharSet, sorted tuple of reachable states) for each disjoint range.
+            """
+            labels = []
+            destinations = []
             for state in states:
-                if symbol in self.transitions.get(state, {}):
-                    result.update(self.transitions[state][symbol])
-            return result
+                for symbol, dests in labeled.get(state, ()):
+                    labels.append(symbol)
+                    destinations.append(dests)
+            if len(labels) == 1:
+                yield labels[0], tuple(sorted(destinations[0]))
+                return
+            for symbol, members in partition(labels):
+                result = set()
+                for index in members:
+                    result.update(destinations[index])
+                yield symbol, tuple(sorted(result))
 
         # Initial ε-closure
-        start_closure = frozenset(epsilon_closure({self.start_state}))
+        start_closure = epsilon_closure((self.start_state,))
         queue = deque([start_closure])
-        visited = {start_closure}
         transitions = {}
         accept_states = set()
 
-        # Mapping frozensets to integer IDs for table representation
+        # Mapping DFA states (sorted tuples of NFA states) to integer IDs for table representation
         state_id_map = {start_closure: 0}
-        id_counter = 1
-
-        lexical_table = []  # Each entry: (state_id, symbol, next_state_id)
 
         while queue:
             current = queue.popleft()
-            if current not in transitions:
-                transitions[current] = {}
-
             current_id = state_id_map[current]
+            current_transitions = transitions[current_id] = {}
 
-            for symbol in self.alphabet:
-                if symbol == 'ε':
-                    continue
-                target = frozenset(epsilon_closure(move(current, symbol)))
-                if not target:
-                    continue
-                if target not in visited:
-                    visited.add(target)
+            for symbol, reachable in moves(current):
+                target = epsilon_closure(reachable)
+                target_id = state_id_map.get(target)
+                if target_id is None:
+                    target_id = state_id_map[target] = len(state_id_map)
                     queue.append(target)
-                    state_id_map[target] = id_counter
-                    id_counter += 1
-
-                transitions[current][symbol] = target
-                target_id = state_id_map[target]
 
-                # Add transition to lexical analysis table
-                lexical_table.append((current_id, symbol, target_id))
+                current_transitions[symbol] = target_id
 
         # Mark accept states
-        for state in visited:
+        for state, state_id in state_id_map.items():
             if any(s in self.final_states for s in state):
-                accept_states.add(state)
-
-        # Print lexical analysis table
-        # print("Lexical Analysis Table:")
-        # print(f"{'From':>5} {'Symbol':>10} {'To':>5}")
-        # for from_id, symbol, to_id in lexical_table:
-        #     print(f"{from_id:>5} {symbol:>10} {to_id:>5}")
+                accept_states.add(state_id)
 
         token_map = {}  # DFA_state_id -> token_type
 
-        for state_set in accept_states:
-            dfa_state_id = state_id_map[state_set]
-            # Pick the first matching final state in the original NFA
-            matched_token_types = [
-                self.token_types[s]
+        for state_set, state_id in state_id_map.items():
+            if state_id not in accept_states:
+                continue
+            matched_states = [
+                s
                 for s in state_set
                 if s in self.final_states and s in self.token_types
             ]
-            if matched_token_types:
-                # Prioritize by order (e.g., for longest match or precedence)
-                token_map[dfa_state_id] = matched_token_types[0]
+            if matched_states:
+                # Prioritize by rule order (lowest priority value, then lowest state)
+                best = min(matched_states, key=lambda s: (self.token_priorities.get(s, 0), s))
+                token_map[state_id] = self.token_types[best]
 
         return afd.AFD(
-            start_state=start_closure,
+            start_state=0,
             accept_states=accept_states,
             transitions=transitions,
             token_map=token_map
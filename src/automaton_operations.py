@@ -1,4 +1,7 @@
 import afn
+from array import array
+from collections import defaultdict, deque
+from compiled_afd import CompiledAFD, DEAD_STATE, OTHER_CLASS, build_class_ranges
 
 class AutomatonOperations:
     """
@@ -6,6 +9,8 @@ class AutomatonOperations:
 
     Currently supports:
         - Union of two AFNs
+        - Union of any number of AFNs in a single pass
+        - Token-aware minimization of compiled AFDs
     """
     @staticmethod
     def union(afn1: afn.AFN, afn2: afn.AFN) -> afn.AFN:
@@ -51,6 +56,186 @@ class AutomatonOperations:
         new_transitions[new_start]['ε'] = {afn1.start_state, afn2.start_state}
         
         new_token_types = {**afn1.token_types, **afn2.token_types}
-        return afn.AFN(new_states, new_start, new_finals, new_transitions, new_alphabet | {'ε'}, new_token_types)
+        new_token_priorities = {**afn1.token_priorities, **afn2.token_priorities}
+        return afn.AFN(new_states, new_start, new_finals, new_transitions, new_alphabet | {'ε'}, new_token_types, new_token_priorities)
 
+    @staticmethod
+    def union_all(afns) -> afn.AFN:
+        """
+        Constructs a new AFN representing the union of any number of AFNs in one pass.
+
+        This operation:
+            - Renumbers the states of every AFN once, by a running offset.
+            - Creates a single new start state with one ε-transition per AFN.
+            - Assigns each AFN's final states the AFN's position as rule priority,
+              so that earlier automata (earlier definitions) win ties.
+
+        Args:
+            afns (Iterable[AFN]): The automata to unite, in priority order.
+
+        Returns:
+            AFN: A new AFN that accepts the union of the languages of all `afns`.
+
+        Raises:
+            ValueError: If `afns` is empty.
+        """
+        new_states = set()
+        new_finals = set()
+        new_alphabet = {'ε'}
+        new_transitions = {}
+        new_token_types = {}
+        new_token_priorities = {}
+        start_states = set()
+
+        offset = 0
+        for priority, automaton in enumerate(afns):
+            new_states.update(s + offset for s in automaton.states)
+            new_finals.update(s + offset for s in automaton.final_states)
+            new_alphabet.update(automaton.alphabet)
+            start_states.add(automaton.start_state + offset)
+
+            for state, trans in automaton.transitions.items():
+                new_transitions[state + offset] = {
+                    symbol: {d + offset for d in dests} for symbol, dests in trans.items()
+                }
+            for state, token_type in automaton.token_types.items():
+                new_token_types[state + offset] = token_type
+                new_token_priorities[state + offset] = priority
+
+            offset += max(automaton.states | automaton.final_states | {automaton.start_state}) + 1
+
+        if not start_states:
+            raise ValueError("Union requires at least one automaton.")
+
+        new_start = offset
+        new_states.add(new_start)
+        new_transitions[new_start] = {'ε': start_states}
+        return afn.AFN(new_states, new_start, new_finals, new_transitions, new_alphabet, new_token_types, new_token_priorities)
+
+    @staticmethod
+    def minimize(dfa: CompiledAFD) -> CompiledAFD:
+        """
+        Minimizes a compiled AFD using Hopcroft's partition refinement (O(n log n)).
+
+        The initial partition separates non-accepting states from accepting states, and
+        accepting states are further split by the token they resolve to, so every state
+        of the result keeps the token of the states it replaces. States that cannot reach
+        an accepting state are merged into the implicit dead state and dropped.
+
+        Args:
+            dfa (CompiledAFD): The automaton to minimize (see CompiledAFD.from_afd).
+
+        Returns:
+            CompiledAFD: An equivalent automaton with the minimum number of states.
+        """
+        num_classes = dfa.num_classes
+        dead = dfa.num_states  # explicit sink so that the DFA is complete
+        num_states = dfa.num_states + 1
+
+        def target(state, class_id):
+            if state == dead:
+                return dead
+            next_state = dfa.table[state * num_classes + class_id]
+            return dead if next_state == DEAD_STATE else next_state
+
+        # Inverse transitions: inverse[class_id][target] -> sources
+        inverse = [defaultdict(list) for _ in range(num_classes)]
+        for state in range(num_states):
+            for class_id in range(num_classes):
+                inverse[class_id][target(state, class_id)].append(state)
+
+        # Initial partition: non-accepting states, then accepting states by token
+        groups = {}
+        for state in range(num_states):
+            if state != dead and dfa.accepting[state]:
+                key = (True, dfa.tokens[state])
+            else:
+                key = (False, None)
+            groups.setdefault(key, set()).add(state)
+
+        blocks = list(groups.values())
+        block_of = [0] * num_states
+        for block_id, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = block_id
+
+        worklist = {(block_id, class_id) for block_id in range(len(blocks)) for class_id in range(num_classes)}
+
+        while worklist:
+            splitter_id, class_id = worklist.pop()
+            predecessors = defaultdict(set)
+            for state in blocks[splitter_id]:
+                for source in inverse[class_id].get(state, ()):
+                    predecessors[block_of[source]].add(source)
+
+            for block_id, inside in predecessors.items():
+                block = blocks[block_id]
+                if len(inside) == len(block):
+                    continue
+                # Keep the larger half in place; the smaller one becomes a new block.
+                # Whether or not the old block is still pending, queueing the new
+                # (smaller) block is enough to refine with respect to both halves.
+                # Both cases cost O(len(inside)), already paid for by the predecessor scan.
+                if 2 * len(inside) <= len(block):
+                    block -= inside
+                else:
+                    outside = block - inside
+                    blocks[block_id] = inside
+                    inside = outside
+                new_id = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = new_id
+                for c in range(num_classes):
+                    worklist.add((new_id, c))
+
+        # Renumber the surviving blocks in BFS order from the start block
+        dead_block = block_of[dead]
+        start_block = block_of[dfa.start_state]
+        block_ids = {start_block: 0}
+        order = [start_block]
+        queue = deque([start_block])
+        while queue:
+            block_id = queue.popleft()
+            representative = next(iter(blocks[block_id]))
+            for class_id in range(num_classes):
+                next_block = block_of[target(representative, class_id)]
+                if next_block != dead_block and next_block not in block_ids:
+                    block_ids[next_block] = len(order)
+                    order.append(next_block)
+                    queue.append(next_block)
+
+        # Merge classes whose columns became identical
+        representatives = [next(iter(blocks[block_id])) for block_id in order]
+        signatures = {}
+        class_remap = [0] * num_classes
+        for class_id in range(1, num_classes):
+            signature = tuple(
+                block_ids.get(block_of[target(rep, class_id)], DEAD_STATE)
+                for rep in representatives
+            )
+            if signature not in signatures:
+                signatures[signature] = len(signatures) + 1
+            class_remap[class_id] = signatures[signature]
+
+        new_num_states = len(order)
+        new_num_classes = len(signatures) + 1
+        table = array('i', [DEAD_STATE]) * (new_num_states * new_num_classes)
+        for signature, class_id in signatures.items():
+            for state_id, target_id in enumerate(signature):
+                table[state_id * new_num_classes + class_id] = target_id
+
+        accepting = array('b', [0]) * new_num_states
+        tokens = [None] * new_num_states
+        for state_id, representative in enumerate(representatives):
+            if representative != dead and dfa.accepting[representative]:
+                accepting[state_id] = 1
+                tokens[state_id] = dfa.tokens[representative]
 
+        class_ranges = []
+        for index, class_id in enumerate(dfa.range_classes[:-1]):
+            if class_id != OTHER_CLASS:
+                low, high = dfa.range_starts[index], dfa.range_starts[index + 1] - 1
+                class_ranges.append((low, high, class_remap[class_id]))
+        range_starts, range_classes = build_class_ranges(class_ranges)
+        return CompiledAFD(new_num_states, new_num_classes, range_starts, range_classes, table, accepting, tokens)
@@ -0,0 +1,119 @@
+from array import array
+from compiled_afd import CompiledAFD, NO_TOKEN
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: classify_lines falls back to a Python loop
+    np = None
+
+DEFAULT_BATCH_SIZE = 64 * 1024
+LOOKUP_CODE_POINTS = 0x10000  # inputs within the BMP are classified through a direct lookup table
+
+def classify_lines(automaton, lines, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Checks many independent strings for full acceptance at once.
+
+    Each string gets the token of the state the automaton ends in after reading all of
+    it, like simulate_dfa_on_line. With NumPy, strings are sorted by length and
+    processed in batches: each batch is encoded as a matrix of character classes
+    (one row per string, padded with a class that keeps every state in place), and
+    all rows advance through the transition table together, one column per step.
+    Without NumPy, the strings are simulated one by one.
+
+    Args:
+        automaton (CompiledAFD | LazyAFD): The compiled automaton.
+        lines (Sequence[str]): The strings to classify.
+        batch_size (int): Number of strings per matrix.
+
+    Returns:
+        tuple[list[str], Sequence[int]]: The token names and, for each string, the index
+                                         of its token in them, or NO_TOKEN if it is rejected.
+    """
+    if np is None or not isinstance(automaton, CompiledAFD):
+        return classify_lines_python(automaton, lines)
+    names, token_ids = automaton.token_ids()
+    return names, classify_lines_numpy(automaton, lines, token_ids, batch_size)
+
+def classify_lines_python(automaton, lines):
+    """Pure Python version of classify_lines (one string at a time)."""
+    table = automaton.table
+    class_map = automaton.class_map
+    num_classes = automaton.num_classes
+    accepting = automaton.accepting
+    state_tokens = automaton.tokens
+    start_state = automaton.start_state
+
+    names = []
+    name_ids = {}
+    results = array('i', [NO_TOKEN]) * len(lines)
+    for index, line in enumerate(lines):
+        state = start_state
+        for symbol in line:
+            class_id = class_map.get(symbol)
+            if class_id is None:
+                class_id = automaton.class_of(symbol)
+            state = table[state * num_classes + class_id]
+            if state < 0:
+                break
+        else:
+            token = state_tokens[state] if accepting[state] else None
+            if token is not None:
+                if token not in name_ids:
+                    name_ids[token] = len(names)
+                    names.append(token)
+                results[index] = name_ids[token]
+    return names, results
+
+def classify_lines_numpy(automaton, lines, token_ids, batch_size):
+    """NumPy version of classify_lines (see there)."""
+    num_states = automaton.num_states
+    num_classes = automaton.num_classes
+    dead_row = num_states  # extra row standing for DEAD_STATE, which loops on itself
+    pad_class = num_classes  # extra column that leaves every state unchanged
+
+    table = np.empty((num_states + 1, num_classes + 1), dtype=np.int32)
+    table[:num_states, :num_classes] = np.asarray(automaton.table, dtype=np.int32).reshape(num_states, num_classes)
+    table[table < 0] = dead_row
+    table[:, pad_class] = np.arange(num_states + 1, dtype=np.int32)
+    table[dead_row, :] = dead_row
+    flat_table = table.ravel()
+    row_size = num_classes + 1
+
+    final_tokens = np.full(num_states + 1, NO_TOKEN, dtype=np.int32)
+    accepting = np.asarray(automaton.accepting, dtype=bool)
+    final_tokens[:num_states][accepting] = np.asarray(token_ids, dtype=np.int32)[accepting]
+
+    range_starts = np.asarray(automaton.range_starts, dtype=np.int64)
+    range_classes = np.asarray(automaton.range_classes, dtype=np.int32)
+
+    # Classes of every character, computed once over the concatenation of all strings
+    codes = np.frombuffer(''.join(lines).encode('utf-32-le', errors='surrogatepass'), dtype='<u4')
+    if codes.size and codes.max() < LOOKUP_CODE_POINTS:
+        lookup = range_classes[np.searchsorted(range_starts, np.arange(LOOKUP_CODE_POINTS), side='right') - 1]
+        classes = lookup[codes]
+    else:
+        classes = range_classes[np.searchsorted(range_starts, codes, side='right') - 1]
+
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    offsets = np.cumsum(lengths) - lengths
+    order = np.argsort(lengths, kind='stable')  # similar lengths share a batch, so little padding
+    results = np.full(len(lines), NO_TOKEN, dtype=np.int32)
+
+    for batch_start in range(0, len(lines), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        batch_lengths = lengths[batch]
+        width = int(batch_lengths[-1])
+
+        # One row per string, one column per step
+        steps = np.arange(width)
+        inside = steps < batch_lengths[:, None]
+        matrix = np.full((len(batch), width), pad_class, dtype=np.int32)
+        matrix[inside] = classes[(offsets[batch][:, None] + steps)[inside]]
+        columns = np.ascontiguousarray(matrix.T)
+
+        states = np.full(len(batch), automaton.start_state, dtype=np.int32)
+        for column in columns:
+            states = flat_table.take(states * row_size + column)
+        results[batch] = final_tokens[states]
+
+    return results
@@ -0,0 +1,264 @@
+import argparse
+import json
+import platform
+import random
+import time
+import regular_expression as re
+import syntax_tree as st
+import afn
+import automaton_operations as ao
+from lexer_compiler import build_combined_afd
+from lexer_simulation import compile_automaton, simulate_dfa_on_text
+from version import __version__
+
+OUTPUT_FILE = "../bench_output.json"
+RULE_SETS = ("keywords", "classes", "pathological")
+STAGES = ("to_postfix", "build_syntax_tree", "compute_nullable_first_last_follow", "build_afd",
+          "union", "to_afd", "compile", "single_pass", "lex")
+
+def keyword_rules(count, seed=0):
+    """
+    Generates 'count' keyword rules followed by an identifier and a number rule.
+
+    Returns:
+        tuple[List[str], List[str]]: The definition lines and the keywords.
+    """
+    rng = random.Random(seed)
+    keywords = set()
+    while len(keywords) < count:
+        keywords.add(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))))
+    keywords = sorted(keywords)
+    lines = [f"kw{i}: {keyword}" for i, keyword in enumerate(keywords)]
+    lines.append("id: [a-zA-Z_][a-zA-Z_0-9]*")
+    lines.append("num: [0-9]+")
+    return lines, keywords
+
+def class_rules(count, seed=0):
+    """
+    Generates 'count' rules made of nested and overlapping character classes,
+    e.g. "c3: [a-f]([0-9x-z]|[A-F_])*[^ \\n]".
+
+    Returns:
+        List[str]: The definition lines.
+    """
+    rng = random.Random(seed)
+    pieces = ["[a-f]", "[0-9x-z]", "[A-F_]", "[a-zA-Z]", "[0-4]", "[^ \\n]", "[g-p]", "[.:-]"]
+    lines = []
+    for i in range(count):
+        parts = []
+        for _ in range(rng.randint(2, 4)):
+            group = rng.choice(pieces)
+            if rng.random() < 0.5:
+                group = f"({group}|{rng.choice(pieces)})"
+            parts.append(group + rng.choice(["", "*", "+", "?"]))
+        lines.append(f"c{i}: " + ''.join(parts))
+    return lines
+
+def pathological_rules(n):
+    """
+    Generates the rule (a|b)*a(a|b)^n, whose minimal AFD has 2^(n+1) states.
+
+    Returns:
+        List[str]: The definition lines.
+    """
+    return ["w: (a|b)*a" + "(a|b)" * n, "sep: [ \\n]+"]
+
+def generate_input(rule_set, size, keywords=(), seed=0):
+    """
+    Generates an input corpus of about 'size' characters for a rule set.
+
+    Args:
+        rule_set (str): One of RULE_SETS.
+        size (int): Approximate number of characters.
+        keywords (Iterable[str]): Keywords to mix in (for the "keywords" rule set).
+        seed (int): Random seed.
+
+    Returns:
+        str: The corpus; words are separated by spaces and newlines.
+    """
+    rng = random.Random(seed)
+    keywords = list(keywords)
+    words = []
+    length = 0
+    while length < size:
+        if rule_set == "keywords":
+            choice = rng.random()
+            if keywords and choice < 0.5:
+                word = rng.choice(keywords)
+            elif choice < 0.8:
+                word = rng.choice('abcxyz_') + ''.join(rng.choice('abc019_') for _ in range(rng.randint(0, 8)))
+            else:
+                word = str(rng.randint(0, 10 ** 6))
+        elif rule_set == "classes":
+            word = ''.join(rng.choice('abcfxyzAF_0149.:-ghp') for _ in range(rng.randint(1, 12)))
+        else:
+            word = ''.join(rng.choice('ab') for _ in range(rng.randint(1, 40)))
+        words.append(word)
+        words.append('\n' if rng.random() < 0.1 else ' ')
+        length += len(word) + 1
+    return ''.join(words)
+
+def build_rule_set(rule_set, size, seed=0):
+    """
+    Returns the definition lines and the keywords (if any) of a generated rule set.
+
+    Args:
+        rule_set (str): One of RULE_SETS.
+        size (int): Number of rules (keywords/classes) or n (pathological).
+        seed (int): Random seed.
+    """
+    if rule_set == "keywords":
+        return keyword_rules(size, seed)
+    if rule_set == "classes":
+        return class_rules(size, seed), []
+    if rule_set == "pathological":
+        return pathological_rules(size), []
+    raise ValueError(f"Unknown rule set: {rule_set}")
+
+def run_pipeline(definitions, text):
+    """
+    Runs every construction stage and the lexer once, timing each stage separately.
+
+    The per-rule stages (to_postfix to build_afd) are summed over all rules; the union
+    stages then join the rule AFDs as in build_automaton(single_pass=False), and
+    single_pass times build_automaton's default combined-tree construction.
+
+    Returns:
+        tuple[dict, dict]: Seconds per stage, and sizes (rules, states, classes, tokens).
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    regular_expressions = [re.RegularExpression.from_definition_line(line) for line in definitions]
+
+    afns = []
+    for regex in regular_expressions:
+        start = clock()
+        postfix = regex.to_postfix(regex.pattern)
+        timings["to_postfix"] += clock() - start
+
+        start = clock()
+        tree = st.SyntaxTree(postfix)
+        root = tree.build_syntax_tree()
+        timings["build_syntax_tree"] += clock() - start
+
+        start = clock()
+        followpos = tree.compute_nullable_first_last_follow(root)
+        timings["compute_nullable_first_last_follow"] += clock() - start
+
+        start = clock()
+        afd = st.build_afd(root, followpos, tree.leaf_positions)
+        timings["build_afd"] += clock() - start
+        afns.append(afn.AFN.from_afd(afd, token_type=regex.name))
+
+    start = clock()
+    union_afn = ao.AutomatonOperations.union_all(afns)
+    timings["union"] = clock() - start
+
+    start = clock()
+    union_afd, token_map = union_afn.to_afd()
+    timings["to_afd"] = clock() - start
+
+    start = clock()
+    automaton = compile_automaton(union_afd, token_map)
+    timings["compile"] = clock() - start
+
+    start = clock()
+    compile_automaton(build_combined_afd(regular_expressions))
+    timings["single_pass"] = clock() - start
+
+    start = clock()
+    tokens = simulate_dfa_on_text(automaton, None, text)
+    timings["lex"] = clock() - start
+
+    sizes = {
+        "rules": len(regular_expressions),
+        "union_nfa_states": len(union_afn.states),
+        "union_afd_states": len(union_afd.transitions),
+        "states": automaton.num_states,
+        "classes": automaton.num_classes,
+        "input_chars": len(text),
+        "tokens": len(tokens),
+    }
+    return timings, sizes
+
+def benchmark(rule_set, size, input_size, repeat=3, seed=0):
+    """
+    Benchmarks one generated rule set and corpus, keeping the best time of each stage.
+
+    Returns:
+        dict: The JSON-serializable result of the run.
+    """
+    definitions, keywords = build_rule_set(rule_set, size, seed)
+    text = generate_input(rule_set, input_size, keywords, seed)
+
+    best = None
+    for _ in range(repeat):
+        timings, sizes = run_pipeline(definitions, text)
+        best = timings if best is None else {stage: min(best[stage], timings[stage]) for stage in STAGES}
+
+    return {
+        "rule_set": rule_set,
+        "size": size,
+        "seed": seed,
+        "stages": best,
+        "sizes": sizes,
+        "lex_chars_per_second": len(text) / best["lex"] if best["lex"] else None,
+    }
+
+def compare(results, baseline):
+    """
+    Prints the ratio of each stage time to a baseline result file (above 1.0 is slower).
+
+    Args:
+        results (dict): The current results, as written by main().
+        baseline (dict): Results of an earlier run with the same rule sets and sizes.
+    """
+    previous = {(run["rule_set"], run["size"]): run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = previous.get((run["rule_set"], run["size"]))
+        if old is None:
+            continue
+        print(f"{run['rule_set']} (size {run['size']}):")
+        for stage in STAGES:
+            before, after = old["stages"].get(stage), run["stages"][stage]
+            if before:
+                print(f"    {stage:<36} {after / before:6.2f}x  ({before:.4f}s -> {after:.4f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the regex -> AFD -> lexer pipeline.")
+    parser.add_argument("--rule-sets", nargs="+", choices=RULE_SETS, default=list(RULE_SETS))
+    parser.add_argument("--size", type=int, nargs="+", default=[50],
+                        help="rules per rule set (n for the pathological set), one run per value")
+    parser.add_argument("--input-size", type=int, default=100000, help="characters of generated input")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (best time is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=OUTPUT_FILE, help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results file to compare against")
+    args = parser.parse_args()
+
+    runs = []
+    for rule_set in args.rule_sets:
+        for size in args.size:
+            # The pathological AFD doubles with every n, so its size is capped
+            size = min(size, 12) if rule_set == "pathological" else size
+            print(f"Benchmarking {rule_set} (size {size})...")
+            runs.append(benchmark(rule_set, size, args.input_size, args.repeat, args.seed))
+
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input_size": args.input_size,
+        "runs": runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
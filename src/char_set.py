@@ -0,0 +1,219 @@
+from bisect import bisect_right
+
+MAX_CODE_POINT = 0x10FFFF
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+
+class CharSet:
+    """
+    Immutable set of characters stored as sorted, disjoint code point ranges.
+
+    Used as the symbol of syntax tree leaves and as the label of automaton transitions,
+    so that a character class such as [a-zA-Z] or [^"] is a single symbol instead of an
+    alternation of every character it contains.
+
+    Attributes:
+        ranges (tuple[tuple[int, int]]): Sorted, non-overlapping, non-adjacent inclusive
+                                         (low, high) code point ranges.
+    """
+    def __init__(self, ranges):
+        merged = []
+        for low, high in sorted(ranges):
+            if merged and low <= merged[-1][1] + 1:
+                if high > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], high)
+            else:
+                merged.append((low, high))
+        self.ranges = tuple(merged)
+        self._starts = [low for low, _ in self.ranges]
+
+    @staticmethod
+    def from_char(char):
+        """Returns the set containing only 'char'."""
+        code = ord(char)
+        return CharSet([(code, code)])
+
+    @staticmethod
+    def from_class(content):
+        """
+        Parses the content of a bracket expression (without the brackets).
+
+        Supports ranges (a-z), negation with a leading '^', and escapes such as
+        '\\]', '\\-', '\\n' or '\\u00e9'.
+
+        Args:
+            content (str): The text between '[' and ']'.
+
+        Returns:
+            CharSet: The set of characters described by the class.
+
+        Raises:
+            ValueError: If a range is reversed (e.g. z-a).
+
+        RE e.g.: 'a-zA-Z' or '^"'
+        """
+        negated = content.startswith('^')
+        if negated:
+            content = content[1:]
+
+        chars = []  # (char, escaped)
+        i = 0
+        while i < len(content):
+            if content[i] == '\\' and i + 1 < len(content):
+                char, i = read_escape(content, i)
+                chars.append((char, True))
+            else:
+                chars.append((content[i], False))
+                i += 1
+
+        ranges = []
+        i = 0
+        while i < len(chars):
+            if i + 2 < len(chars) and chars[i + 1] == ('-', False):
+                start, end = ord(chars[i][0]), ord(chars[i + 2][0])
+                if start > end:
+                    raise ValueError(f"Invalid character range: {chars[i][0]}-{chars[i + 2][0]}")
+                ranges.append((start, end))
+                i += 3
+            else:
+                code = ord(chars[i][0])
+                ranges.append((code, code))
+                i += 1
+
+        char_set = CharSet(ranges)
+        return char_set.complement() if negated else char_set
+
+    @staticmethod
+    def from_token(token):
+        """
+        Builds the set for a regular expression operand token: a bracket expression,
+        an escape sequence (e.g. '\\.') or a single literal character.
+        """
+        if len(token) >= 2 and token[0] == '[' and token[-1] == ']':
+            return CharSet.from_class(token[1:-1])
+        if len(token) >= 2 and token[0] == '\\':
+            char, _ = read_escape(token, 0)
+            return CharSet.from_char(char)
+        if len(token) == 1:
+            return CharSet.from_char(token)
+        raise ValueError(f"Invalid operand: {token}")
+
+    @staticmethod
+    def from_text(text):
+        """Parses the compact text form produced by to_text() (e.g. '65-90;97-122')."""
+        ranges = []
+        for part in text.split(';'):
+            low, _, high = part.partition('-')
+            ranges.append((int(low), int(high or low)))
+        return CharSet(ranges)
+
+    def to_text(self):
+        """Returns a compact, comma-free text form of the set (e.g. '65-90;97-122')."""
+        return ';'.join(str(low) if low == high else f"{low}-{high}" for low, high in self.ranges)
+
+    def complement(self):
+        """Returns the set of all code points not in this set."""
+        ranges = []
+        next_low = 0
+        for low, high in self.ranges:
+            if low > next_low:
+                ranges.append((next_low, low - 1))
+            next_low = high + 1
+        if next_low <= MAX_CODE_POINT:
+            ranges.append((next_low, MAX_CODE_POINT))
+        return CharSet(ranges)
+
+    def contains_code(self, code):
+        """Returns True if the code point 'code' belongs to the set."""
+        index = bisect_right(self._starts, code) - 1
+        return index >= 0 and code <= self.ranges[index][1]
+
+    def __contains__(self, char):
+        return self.contains_code(ord(char))
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def __eq__(self, other):
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self.ranges == other.ranges
+
+    def __lt__(self, other):
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self.ranges < other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __str__(self):
+        """Returns the set in bracket notation, e.g. [a-zA-Z] or a single character."""
+        if len(self.ranges) == 1 and self.ranges[0][0] == self.ranges[0][1]:
+            return format_char(self.ranges[0][0])
+        parts = []
+        for low, high in self.ranges:
+            if low == high:
+                parts.append(format_char(low))
+            else:
+                parts.append(f"{format_char(low)}-{format_char(high)}")
+        return '[' + ''.join(parts) + ']'
+
+    def __repr__(self):
+        return f"CharSet({self})"
+
+def read_escape(text, i):
+    """
+    Reads the escape sequence starting at text[i] (a backslash).
+
+    Returns:
+        tuple[str, int]: The escaped character and the index right after the sequence.
+    """
+    char = text[i + 1]
+    if char == 'u' and i + 6 <= len(text):
+        return chr(int(text[i + 2:i + 6], 16)), i + 6
+    return ESCAPES.get(char, char), i + 2
+
+def format_char(code):
+    """Formats a code point for display, escaping non-printable characters."""
+    char = chr(code)
+    if char in '[]-^\\':
+        return '\\' + char
+    if char.isprintable() and not char.isspace():
+        return char
+    return f"\\u{code:04x}" if code <= 0xFFFF else f"\\U{code:08x}"
+
+def partition(char_sets):
+    """
+    Splits a collection of (possibly overlapping) character sets into disjoint pieces.
+
+    Every returned piece is fully contained in each of the input sets it is listed with,
+    and is disjoint from all other inputs. Characters covered by no input are omitted.
+
+    Args:
+        char_sets (list[CharSet]): The sets to refine.
+
+    Returns:
+        list[tuple[CharSet, frozenset[int]]]: Each disjoint piece with the indices of the
+                                              input sets that contain it.
+    """
+    events = []
+    for index, char_set in enumerate(char_sets):
+        for low, high in char_set.ranges:
+            events.append((low, 1, index))
+            events.append((high + 1, -1, index))
+    events.sort()
+
+    pieces = {}
+    active = {}
+    previous = None
+    for point, delta, index in events:
+        if previous is not None and point > previous and active:
+            members = frozenset(active)
+            pieces.setdefault(members, []).append((previous, point - 1))
+        active[index] = active.get(index, 0) + delta
+        if not active[index]:
+            del active[index]
+        previous = point
+
+    return [(CharSet(ranges), members) for members, ranges in pieces.items()]
@@ -0,0 +1,338 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import deque
+from char_set import CharSet, partition
+
+DEAD_STATE = -1
+OTHER_CLASS = 0
+PRECOMPUTED_CODE_POINTS = 128  # ASCII classes are filled eagerly, the rest on first use
+
+# Binary format: header, then int32 sections (table, token ids, range starts, range
+# classes), the int8 accepting vector padded to 4 bytes, and the JSON token names.
+BINARY_MAGIC = b'AFDB'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sIiiiii')  # magic, version, states, classes, start, ranges, names size
+NO_TOKEN = -1
+
+class CompiledAFD:
+    """
+    Dense integer representation of an AFD, used by the lexer hot loop.
+
+    States are numbered 0..N-1 (the start state is always 0) and every input
+    character is mapped to an equivalence-class id: characters that lead to the
+    same target from every state share a class. Class 0 is reserved for characters
+    outside the alphabet, which never have a transition.
+
+    Attributes:
+        num_states (int): Number of states.
+        num_classes (int): Number of character classes (including class 0).
+        start_state (int): The starting state id (always 0).
+        range_starts (list[int]): Sorted code points where a run of same-class characters begins.
+        range_classes (list[int]): Class id of the run starting at the matching range_starts entry.
+        class_map (dict[str, int]): Cache of character -> class id, filled lazily by class_of().
+        table (array[int]): Flat transition table, indexed by state * num_classes + class_id.
+                            Missing transitions hold DEAD_STATE (-1).
+        accepting (array[int]): 1 for accepting states, 0 otherwise.
+        tokens (list[str | None]): Token of each state, resolved once at compile time
+                                   (None for non-accepting states and untokenized rules).
+    """
+    def __init__(self, num_states, num_classes, range_starts, range_classes, table, accepting, tokens, start_state=0):
+        self.num_states = num_states
+        self.num_classes = num_classes
+        self.start_state = start_state
+        self.range_starts = range_starts
+        self.range_classes = range_classes
+        self.table = table
+        self.accepting = accepting
+        self.tokens = tokens
+        self.class_map = {}
+        for code in range(PRECOMPUTED_CODE_POINTS):
+            self.class_of(chr(code))
+
+    @staticmethod
+    def from_afd(dfa, token_map=None):
+        """
+        Compiles an AFD (as returned by build_afd or AFN.to_afd) into its dense form.
+
+        Args:
+            dfa (AFD): The automaton to compile.
+            token_map (dict, optional): Mapping from accepting states to their resolved token
+                                        (defaults to dfa.token_map).
+
+        Returns:
+            CompiledAFD: The compiled automaton.
+        """
+        token_map = token_map if token_map is not None else dfa.token_map
+
+        # Number states in BFS order so that the start state is 0
+        state_ids = {dfa.start_state: 0}
+        order = [dfa.start_state]
+        queue = deque([dfa.start_state])
+        while queue:
+            state = queue.popleft()
+            for target in dfa.transitions.get(state, {}).values():
+                if target not in state_ids:
+                    state_ids[target] = len(order)
+                    order.append(target)
+                    queue.append(target)
+
+        # Refine every transition label into disjoint pieces
+        labels = []
+        label_ids = {}
+        for trans in dfa.transitions.values():
+            for symbol in trans:
+                if symbol not in label_ids:
+                    label_ids[symbol] = len(labels)
+                    labels.append(symbol)
+        pieces = partition(labels)
+        pieces_by_label = [[] for _ in labels]
+        for piece_id, (_, members) in enumerate(pieces):
+            for label_id in members:
+                pieces_by_label[label_id].append(piece_id)
+
+        # Group pieces with identical columns into the same class
+        columns = [[DEAD_STATE] * len(order) for _ in pieces]
+        for state, state_id in state_ids.items():
+            for symbol, target in dfa.transitions.get(state, {}).items():
+                for piece_id in pieces_by_label[label_ids[symbol]]:
+                    columns[piece_id][state_id] = state_ids[target]
+
+        signatures = {}
+        class_ranges = []
+        for (piece, _), column in sorted(zip(pieces, columns)):
+            signature = tuple(column)
+            if signature not in signatures:
+                signatures[signature] = len(signatures) + 1
+            class_id = signatures[signature]
+            class_ranges.extend((low, high, class_id) for low, high in piece.ranges)
+
+        num_states = len(order)
+        num_classes = len(signatures) + 1
+        table = array('i', [DEAD_STATE]) * (num_states * num_classes)
+        for signature, class_id in signatures.items():
+            for state_id, target_id in enumerate(signature):
+                table[state_id * num_classes + class_id] = target_id
+
+        accepting = array('b', [0]) * num_states
+        tokens = [None] * num_states
+        for state in dfa.accept_states:
+            if state in state_ids:
+                state_id = state_ids[state]
+                accepting[state_id] = 1
+                tokens[state_id] = token_map.get(state)
+
+        range_starts, range_classes = build_class_ranges(class_ranges)
+        return CompiledAFD(num_states, num_classes, range_starts, range_classes, table, accepting, tokens)
+
+    def save_binary(self, filename):
+        """
+        Writes the automaton to a file in the binary format read by load_binary().
+
+        Args:
+            filename (str): Path to the output file.
+        """
+        with open(filename, 'wb') as f:
+            f.write(self.to_bytes())
+
+    def to_bytes(self):
+        """
+        Serializes the automaton into the compact binary format.
+
+        Layout (little-endian), after the header:
+            - table: int32[num_states * num_classes]
+            - token ids: int32[num_states], index into the token names or NO_TOKEN
+            - range starts and range classes: int32[num_ranges] each
+            - accepting: int8[num_states], padded to a multiple of 4 bytes
+            - token names: UTF-8 JSON list
+
+        Returns:
+            bytes: The serialized automaton.
+        """
+        names, token_ids = self.token_ids()
+        names_bytes = json.dumps(names).encode('utf-8')
+        accepting = bytes(self.accepting)
+        padding = b'\0' * (-len(accepting) % 4)
+        header = BINARY_HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, self.num_states, self.num_classes,
+            self.start_state, len(self.range_starts), len(names_bytes)
+        )
+        return b''.join([
+            header,
+            int32_bytes(self.table),
+            int32_bytes(token_ids),
+            int32_bytes(self.range_starts),
+            int32_bytes(self.range_classes),
+            accepting + padding,
+            names_bytes,
+        ])
+
+    @staticmethod
+    def load_binary(filename, use_mmap=True):
+        """
+        Loads an automaton written by save_binary().
+
+        With use_mmap, the file is memory-mapped read-only and the transition table,
+        accepting vector and class ranges are used in place, without parsing or copying.
+        Processes that map the same file share its pages.
+
+        Args:
+            filename (str): Path to the binary automaton file.
+            use_mmap (bool): Map the file instead of reading it into memory.
+
+        Returns:
+            CompiledAFD: The loaded automaton.
+        """
+        with open(filename, 'rb') as f:
+            if use_mmap:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+        return CompiledAFD.from_buffer(buffer)
+
+    @staticmethod
+    def from_buffer(buffer):
+        """
+        Builds an automaton over a buffer in the binary format (see to_bytes()).
+
+        Raises:
+            ValueError: If the buffer is not a supported binary automaton.
+        """
+        view = memoryview(buffer)
+        if len(view) < BINARY_HEADER.size:
+            raise ValueError("Invalid binary automaton: truncated header.")
+        magic, version, num_states, num_classes, start_state, num_ranges, names_size = BINARY_HEADER.unpack_from(view, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("Invalid binary automaton: unknown format or version.")
+        if min(num_states, num_classes, num_ranges, names_size) < 0:
+            raise ValueError("Invalid binary automaton: negative section size.")
+        expected_size = (BINARY_HEADER.size + 4 * (num_states * num_classes + num_states + 2 * num_ranges)
+                         + num_states + (-num_states % 4) + names_size)
+        if len(view) != expected_size:
+            raise ValueError(f"Invalid binary automaton: expected {expected_size} bytes, got {len(view)}.")
+
+        offset = BINARY_HEADER.size
+        sections = []
+        for count in (num_states * num_classes, num_states, num_ranges, num_ranges):
+            sections.append(int32_view(view[offset:offset + 4 * count]))
+            offset += 4 * count
+        table, token_ids, range_starts, range_classes = sections
+
+        accepting = view[offset:offset + num_states].cast('b')
+        offset += num_states + (-num_states % 4)
+        names = json.loads(bytes(view[offset:offset + names_size]).decode('utf-8'))
+        if any(token_id != NO_TOKEN and not 0 <= token_id < len(names) for token_id in token_ids):
+            raise ValueError("Invalid binary automaton: token id out of range.")
+        tokens = [names[token_id] if token_id != NO_TOKEN else None for token_id in token_ids]
+
+        return CompiledAFD(num_states, num_classes, range_starts, range_classes, table, accepting, tokens, start_state)
+
+    def token_ids(self):
+        """
+        Numbers the distinct token names of the automaton.
+
+        Returns:
+            tuple[list[str], array[int]]: The token names, in order of first appearance, and
+                                          the index of each state's token in them (NO_TOKEN
+                                          for states without a token).
+        """
+        names = []
+        name_ids = {}
+        token_ids = array('i', [NO_TOKEN]) * self.num_states
+        for state, token in enumerate(self.tokens):
+            if token is None:
+                continue
+            if token not in name_ids:
+                name_ids[token] = len(names)
+                names.append(token)
+            token_ids[state] = name_ids[token]
+        return names, token_ids
+
+    def class_char_sets(self):
+        """
+        Returns the characters of each class.
+
+        Returns:
+            list[CharSet]: The set of characters mapped to each class id.
+        """
+        ranges = [[] for _ in range(self.num_classes)]
+        for index in range(len(self.range_starts) - 1):
+            low, high = self.range_starts[index], self.range_starts[index + 1] - 1
+            ranges[self.range_classes[index]].append((low, high))
+        return [CharSet(class_ranges) for class_ranges in ranges]
+
+    def class_of(self, symbol):
+        """
+        Returns the class id of the character 'symbol', caching it in class_map.
+        """
+        index = bisect_right(self.range_starts, ord(symbol)) - 1
+        class_id = self.range_classes[index] if index >= 0 else OTHER_CLASS
+        self.class_map[symbol] = class_id
+        return class_id
+
+    def next_state(self, state, symbol):
+        """
+        Returns the state reached from 'state' by reading 'symbol', or DEAD_STATE.
+        """
+        class_id = self.class_map.get(symbol)
+        if class_id is None:
+            class_id = self.class_of(symbol)
+        return self.table[state * self.num_classes + class_id]
+
+    def __str__(self):
+        """Returns a human-readable summary of the compiled automaton."""
+        lines = ["CompiledAFD:"]
+        lines.append(f"States: {self.num_states}")
+        lines.append(f"Classes: {self.num_classes}")
+        lines.append(f"Accept states: {[s for s in range(self.num_states) if self.accepting[s]]}")
+        return "\n".join(lines)
+
+def build_class_ranges(class_ranges):
+    """
+    Builds the run-length class lookup used by CompiledAFD.class_of().
+
+    Args:
+        class_ranges (list[tuple[int, int, int]]): Disjoint (low, high, class_id) code point ranges.
+
+    Returns:
+        tuple[list[int], list[int]]: range_starts and range_classes, with the gaps between
+                                     ranges mapped to OTHER_CLASS and adjacent runs of the
+                                     same class merged.
+    """
+    range_starts = []
+    range_classes = []
+    next_low = 0
+    for low, high, class_id in sorted(class_ranges):
+        if low > next_low:
+            range_starts.append(next_low)
+            range_classes.append(OTHER_CLASS)
+        if not range_classes or range_classes[-1] != class_id:
+            range_starts.append(low)
+            range_classes.append(class_id)
+        next_low = high + 1
+    range_starts.append(next_low)
+    range_classes.append(OTHER_CLASS)
+    return range_starts, range_classes
+
+def int32_bytes(values):
+    """Serializes a sequence of ints as little-endian int32."""
+    values = array('i', values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+def int32_view(view):
+    """
+    Returns an indexable view of little-endian int32 data.
+
+    On little-endian machines the data is used in place; otherwise it is copied
+    into a byte-swapped array.
+    """
+    if sys.byteorder == 'little':
+        return view.cast('i')
+    values = array('i', bytes(view))
+    values.byteswap()
+    return values
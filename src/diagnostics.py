@@ -0,0 +1,102 @@
+import sys
+
+class LexicalError:
+    """
+    A character that starts no token, as reported to an error sink.
+
+    Attributes:
+        offset (int): Position of the character in the input (in bytes for byte input).
+        line (int): 1-based line number.
+        column (int): 1-based column (in bytes for byte input).
+        char (str): The offending character.
+    """
+    __slots__ = ('offset', 'line', 'column', 'char')
+
+    def __init__(self, offset, line, column, char):
+        self.offset = offset
+        self.line = line
+        self.column = column
+        self.char = char
+
+    def __eq__(self, other):
+        if not isinstance(other, LexicalError):
+            return NotImplemented
+        return (self.offset, self.line, self.column, self.char) == (other.offset, other.line, other.column, other.char)
+
+    def __str__(self):
+        return f"Lexical error at line {self.line}, column {self.column}: unexpected {self.char!r}"
+
+    def __repr__(self):
+        return f"LexicalError(offset={self.offset}, line={self.line}, column={self.column}, char={self.char!r})"
+
+class ErrorCollector:
+    """
+    Error sink that keeps the reported errors in a list.
+
+    Attributes:
+        errors (list[LexicalError]): The collected errors, in input order.
+        limit (int | None): Maximum number of errors kept; further errors are only counted.
+        dropped (int): Number of errors reported after the limit was reached.
+    """
+    def __init__(self, limit=None):
+        self.errors = []
+        self.limit = limit
+        self.dropped = 0
+
+    def __call__(self, error):
+        if self.limit is not None and len(self.errors) >= self.limit:
+            self.dropped += 1
+        else:
+            self.errors.append(error)
+
+def print_error(error, file=None):
+    """Error sink that writes each error on its own line (to stderr by default)."""
+    print(error, file=file or sys.stderr)
+
+class LineTracker:
+    """
+    Turns input offsets into (line, column) positions, counting line breaks incrementally.
+
+    Only used when an error sink is set, and only when an error is reported, so the
+    lexer hot loop does not pay for it. Offsets passed to locate() must not decrease.
+
+    Attributes:
+        line (int): Line number at 'position'.
+        line_start (int): Offset where that line starts.
+        position (int): Offset up to which line breaks have been counted.
+    """
+    __slots__ = ('line', 'line_start', 'position')
+
+    def __init__(self):
+        self.line = 1
+        self.line_start = 0
+        self.position = 0
+
+    def advance(self, text, end, base=0):
+        """
+        Counts the line breaks of 'text' up to index 'end'.
+
+        Args:
+            text (str | bytes-like): The current input buffer.
+            end (int): Index in 'text' to count up to.
+            base (int): Input offset of text[0].
+        """
+        start = self.position - base
+        if end <= start:
+            return
+        segment = text[start:end]
+        if isinstance(segment, memoryview):
+            segment = segment.tobytes()
+        newline = '\n' if isinstance(segment, str) else b'\n'
+        count = segment.count(newline)
+        if count:
+            self.line += count
+            self.line_start = base + start + segment.rindex(newline) + 1
+        self.position = base + end
+
+    def locate(self, text, index, base=0):
+        """
+        Returns the (line, column) of text[index], both 1-based.
+        """
+        self.advance(text, index, base)
+        return self.line, base + index - self.line_start + 1
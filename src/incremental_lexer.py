@@ -0,0 +1,214 @@
+from bisect import bisect_right
+from heapq import heappop, heappush
+
+class IncrementalLexer:
+    """
+    Token stream of a text that is kept up to date as the text is edited.
+
+    Tokens are produced with the same maximal munch as simulate_dfa_on_text, and cover
+    the text without gaps (characters that start no token are "erro!" tokens). Every
+    token is scanned from the DFA start state, so each token boundary is a restart
+    point. For each token, the lexer also keeps how far its scan looked ahead (the
+    character that stopped the DFA), since a change there could have made the token
+    longer or shorter. The largest lookahead bounds how far back an edit can reach; it
+    is kept in a heap of lookahead counts, so it shrinks again once the long scan (e.g.
+    an unterminated string running to the end of the text) is re-lexed.
+
+    After an edit, re-lexing starts at the first token whose scan reached the edited
+    range, and stops as soon as a new token ends on an old token boundary past the
+    edit: from there on the text, and so the old tokens, are unchanged. Token offsets
+    after the edit are shifted lazily (the pending shift only moves between edit
+    points), so the cost of an edit depends on the edit and the distance to the previous
+    one, not on the size of the text (apart from the copy of the text string itself).
+
+    Attributes:
+        automaton (CompiledAFD | LazyAFD): The automaton the lexer runs over.
+        text (str): The current text.
+        starts (list[int]): Start offset of each token, minus 'shift' from 'shift_from' on.
+        tokens (list[str]): Token name of each token ("erro!" for errors).
+        lookaheads (list[int]): Characters each token's scan examined past the token.
+        lookahead_counts (dict[int, int]): Number of tokens with each lookahead.
+        lookahead_heap (list[int]): Negated lookaheads, for max_lookahead().
+        shift (int): Pending offset shift of the tokens from index 'shift_from' on.
+        shift_from (int): First token index the pending shift applies to.
+    """
+    def __init__(self, automaton, text=""):
+        self.automaton = automaton
+        self.text = ""
+        self.starts = []
+        self.tokens = []
+        self.lookaheads = []
+        self.lookahead_counts = {}
+        self.lookahead_heap = []
+        self.shift = 0
+        self.shift_from = 0
+        self.edit(0, 0, text)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        for index in range(len(self.tokens)):
+            yield self.token(index)
+
+    def start_of(self, index):
+        """Returns the offset of token 'index' in the current text."""
+        start = self.starts[index]
+        return start + self.shift if index >= self.shift_from else start
+
+    def end_of(self, index):
+        """Returns the offset just past token 'index'."""
+        return self.start_of(index + 1) if index + 1 < len(self.starts) else len(self.text)
+
+    def token(self, index):
+        """
+        Returns token 'index'.
+
+        Returns:
+            Tuple[str, str, int]: (lexeme, token, offset).
+        """
+        start = self.start_of(index)
+        return (self.text[start:self.end_of(index)], self.tokens[index], start)
+
+    def index_at(self, offset):
+        """Returns the index of the token containing 'offset' (the last token at the end of the text)."""
+        index = bisect_right(self.starts, offset, 0, self.shift_from)
+        if index == self.shift_from:
+            index = bisect_right(self.starts, offset - self.shift, self.shift_from)
+        return max(index - 1, 0)
+
+    def max_lookahead(self):
+        """Returns the largest lookahead of the current tokens (at least 1)."""
+        heap = self.lookahead_heap
+        counts = self.lookahead_counts
+        while heap and not counts.get(-heap[0]):
+            counts.pop(-heappop(heap), None)
+        return -heap[0] if heap else 1
+
+    def count_lookaheads(self, lookaheads, step):
+        """Adds 'step' (1 or -1) to the count of each of 'lookaheads'."""
+        counts = self.lookahead_counts
+        for lookahead in lookaheads:
+            count = counts.get(lookahead)
+            if count is None:  # every key of counts has one entry in the heap
+                heappush(self.lookahead_heap, -lookahead)
+                count = 0
+            counts[lookahead] = count + step
+
+    def edit(self, start, end, new_text):
+        """
+        Replaces text[start:end] with 'new_text' and re-lexes the affected tokens.
+
+        Args:
+            start (int): First offset of the replaced range.
+            end (int): Offset just past the replaced range (equal to start for an insertion).
+            new_text (str): The replacement (empty for a deletion).
+
+        Returns:
+            tuple[int, int, int]: (first, removed, inserted): tokens[first:first + removed]
+                                  of the old stream were replaced by tokens[first:first + inserted].
+
+        Raises:
+            ValueError: If the range is not within the text.
+        """
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Invalid edit range [{start}, {end}) for a text of length {len(self.text)}")
+        delta = len(new_text) - (end - start)
+        count = len(self.tokens)
+
+        # Restart at the first token whose scan reached the edit
+        first = self.index_at(start) if count else 0
+        max_lookahead = self.max_lookahead()
+        index = first - 1
+        while index >= 0:
+            token_end = self.end_of(index)
+            if token_end <= start - max_lookahead:
+                break
+            if token_end + self.lookaheads[index] > start:
+                first = index
+            index -= 1
+
+        self.text = text = self.text[:start] + new_text + self.text[end:]
+        position = self.start_of(first) if count else 0
+        edit_end = start + len(new_text)
+
+        new_starts = []
+        new_tokens = []
+        new_lookaheads = []
+        old = first  # first old token not yet known to be replaced
+        while position < len(text):
+            token_end, token, scan_end = self.scan(text, position)
+            new_starts.append(position)
+            new_tokens.append(token)
+            new_lookaheads.append(scan_end - token_end)
+            position = token_end
+
+            if position >= edit_end:
+                # Resynchronized if an old token starts here (in old text offsets)
+                old_position = position - delta
+                while old < count and self.start_of(old) < old_position:
+                    old += 1
+                if old < count and self.start_of(old) == old_position:
+                    break
+        else:
+            old = count
+
+        # Make the pending shift start at 'first', then splice the new tokens in
+        if self.shift_from < first:
+            for index in range(self.shift_from, first):
+                self.starts[index] += self.shift
+        else:
+            for index in range(first, min(self.shift_from, count)):
+                self.starts[index] -= self.shift
+        self.shift += delta
+        self.shift_from = first
+        self.starts[first:old] = [start - self.shift for start in new_starts]
+        self.tokens[first:old] = new_tokens
+        self.count_lookaheads(self.lookaheads[first:old], -1)
+        self.count_lookaheads(new_lookaheads, 1)
+        self.lookaheads[first:old] = new_lookaheads
+        return first, old - first, len(new_tokens)
+
+    def scan(self, text, i):
+        """
+        Scans one token from text[i] with maximal munch (the loop of simulate_dfa_on_text).
+
+        Returns:
+            tuple[int, str, int]: The token end, its name ("erro!" if no token starts at i)
+                                  and the offset just past the character that stopped the scan.
+        """
+        automaton = self.automaton
+        table = automaton.table
+        class_map = automaton.class_map
+        num_classes = automaton.num_classes
+        accepting = automaton.accepting
+        state_tokens = automaton.tokens
+
+        state = automaton.start_state
+        last_token = None
+        last_accepting_index = i
+        current_index = i
+        length = len(text)
+
+        while current_index < length:
+            symbol = text[current_index]
+            class_id = class_map.get(symbol)
+            if class_id is None:
+                class_id = automaton.class_of(symbol)
+            next_state = table[state * num_classes + class_id]
+
+            if next_state < 0:
+                break
+
+            state = next_state
+            current_index += 1
+
+            if accepting[state]:
+                last_token = state_tokens[state]
+                last_accepting_index = current_index
+
+        # Reaching the end of the text counts as looking at the character after it
+        scan_end = current_index + 1
+        if last_accepting_index > i:
+            return last_accepting_index, last_token or "erro!", scan_end
+        return i + 1, "erro!", scan_end
@@ -0,0 +1,198 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class StageRecord:
+    """
+    Cost of one pipeline stage, as recorded by Profiler.stage().
+
+    Attributes:
+        name (str): Stage name (e.g. "build_afd").
+        rule (str | None): Name of the rule the stage worked on, if it was a per-rule stage.
+        seconds (float | None): Wall time (None for records that only carry sizes).
+        peak_memory (int | None): Peak memory allocated during the stage, in bytes (None
+                                  when memory is not traced).
+        sizes (dict[str, int | float]): Sizes reported by the stage (positions, states, ...).
+    """
+    __slots__ = ('name', 'rule', 'seconds', 'peak_memory', 'sizes')
+
+    def __init__(self, name, rule=None):
+        self.name = name
+        self.rule = rule
+        self.seconds = 0.0
+        self.peak_memory = None
+        self.sizes = {}
+
+    def to_dict(self):
+        """Returns the record as a JSON-serializable dict."""
+        return {
+            "name": self.name,
+            "rule": self.rule,
+            "seconds": self.seconds,
+            "peak_memory": self.peak_memory,
+            "sizes": dict(self.sizes),
+        }
+
+    def __repr__(self):
+        return f"StageRecord({self.name!r}, rule={self.rule!r}, seconds={self.seconds}, peak_memory={self.peak_memory})"
+
+class Profiler:
+    """
+    Collects wall time, peak memory and sizes for every stage of the pipeline.
+
+    Stages are recorded with the stage() context manager, which yields a StageRecord the
+    stage can add its sizes to. Functions that accept a 'profiler' argument also accept
+    None, in which case they record nothing and pay nothing. Stages are not meant to be
+    nested: the memory peak is reset when a stage starts.
+
+    E.g.:
+        profiler = Profiler()
+        lexer = compile_lexer(definitions, profiler=profiler)
+        print(profiler.report())
+
+    Attributes:
+        records (list[StageRecord]): The recorded stages, in order.
+        trace_memory (bool): Whether peak memory is measured (with tracemalloc).
+        on_record (callable | None): Called with every StageRecord once its stage ends.
+    """
+    def __init__(self, trace_memory=True, on_record=None):
+        self.records = []
+        self.trace_memory = trace_memory
+        self.on_record = on_record
+        self.started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    @contextmanager
+    def stage(self, name, rule=None):
+        """
+        Records the stage run inside the 'with' block.
+
+        Args:
+            name (str): The stage name.
+            rule (str, optional): The rule the stage works on.
+
+        Yields:
+            StageRecord: The record of the stage; set its 'sizes' inside the block. A
+                         "tokens" size also gets its "tokens_per_second" rate.
+        """
+        record = StageRecord(name, rule)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.trace_memory:
+                record.peak_memory = max(tracemalloc.get_traced_memory()[1] - memory_before, 0)
+            if "tokens" in record.sizes:
+                record.sizes["tokens_per_second"] = record.sizes["tokens"] / record.seconds if record.seconds else 0.0
+            self.add(record)
+
+    def add(self, record):
+        """Adds a record measured elsewhere (e.g. in a worker process)."""
+        self.records.append(record)
+        if self.on_record is not None:
+            self.on_record(record)
+
+    def close(self):
+        """Stops tracemalloc if this profiler started it."""
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def totals(self):
+        """
+        Returns the total time and highest memory peak of each stage name.
+
+        Returns:
+            dict[str, dict]: {name: {"seconds": float, "peak_memory": int | None, "count": int}}.
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record.name, {"seconds": 0.0, "peak_memory": None, "count": 0})
+            total["seconds"] += record.seconds or 0.0
+            total["count"] += 1
+            if record.peak_memory is not None:
+                total["peak_memory"] = max(total["peak_memory"] or 0, record.peak_memory)
+        return totals
+
+    def by_rule(self):
+        """
+        Returns the total time spent on each rule, most expensive first. Untimed
+        records are left out, so this is empty for a single-pass build.
+
+        Returns:
+            list[tuple[str, float]]: (rule name, seconds) pairs.
+        """
+        seconds = {}
+        for record in self.records:
+            if record.rule is not None and record.seconds is not None:
+                seconds[record.rule] = seconds.get(record.rule, 0.0) + record.seconds
+        return sorted(seconds.items(), key=lambda item: item[1], reverse=True)
+
+    def to_dict(self):
+        """Returns all records as a JSON-serializable dict."""
+        return {"records": [record.to_dict() for record in self.records], "totals": self.totals()}
+
+    def report(self, top_rules=5, size_key="followpos_entries"):
+        """
+        Formats the recorded stages as a human-readable table.
+
+        Args:
+            top_rules (int): Number of most expensive rules to list.
+            size_key (str): Size by which rules are ranked when no per-rule stage was timed.
+
+        Returns:
+            str: The report.
+        """
+        lines = [f"{'Stage':<36} {'Time (s)':>10} {'Peak (KiB)':>11}  Sizes"]
+        for record in self.records:
+            if record.rule is not None:
+                continue
+            peak = f"{record.peak_memory / 1024:.1f}" if record.peak_memory is not None else "-"
+            sizes = ", ".join(f"{key}={format_size(value)}" for key, value in record.sizes.items())
+            lines.append(f"{record.name:<36} {record.seconds:>10.4f} {peak:>11}  {sizes}")
+
+        sizes = {}
+        for record in self.records:
+            if record.rule is not None:
+                sizes.setdefault(record.rule, {}).update(record.sizes)
+
+        rules = self.by_rule()
+        if rules:
+            lines.append("")
+            lines.append(f"Most expensive rules (of {len(rules)}):")
+            for rule, seconds in rules[:top_rules]:
+                details = ", ".join(f"{key}={format_size(value)}" for key, value in sizes[rule].items())
+                lines.append(f"    {rule:<32} {seconds:>10.4f}  {details}")
+        elif any(size_key in rule_sizes for rule_sizes in sizes.values()):
+            # Shared stages (single-pass build): rank by size, there is no per-rule time
+            ranked = sorted(sizes.items(), key=lambda item: item[1].get(size_key, 0), reverse=True)
+            lines.append("")
+            lines.append(f"Largest rules by {size_key} (of {len(ranked)}, stages are shared so not timed per rule):")
+            for rule, rule_sizes in ranked[:top_rules]:
+                details = ", ".join(f"{key}={format_size(value)}" for key, value in rule_sizes.items())
+                lines.append(f"    {rule:<32} {details}")
+        return "\n".join(lines)
+
+def format_size(value):
+    """Formats a size for the report (floats with two decimals)."""
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+@contextmanager
+def profile_stage(profiler, name, rule=None):
+    """
+    Records a stage with 'profiler', or does nothing if profiler is None.
+
+    Yields:
+        StageRecord: The stage record (a throwaway one when profiler is None).
+    """
+    if profiler is None:
+        yield StageRecord(name, rule)
+        return
+    with profiler.stage(name, rule) as record:
+        yield record
@@ -0,0 +1,239 @@
+from bisect import bisect_right
+from char_set import partition
+from compiled_afd import DEAD_STATE, OTHER_CLASS, PRECOMPUTED_CODE_POINTS, build_class_ranges
+
+DEFAULT_MAX_STATES = 10000
+THRASH_RATIO = 0.5  # share of cache misses creating a new state above which the cache is not worth keeping
+
+class LazyTable(dict):
+    """
+    Transition table of a LazyAFD: a dict indexed like CompiledAFD.table
+    (state * num_classes + class_id) whose missing entries are computed on first use.
+    """
+    __slots__ = ('automaton',)
+
+    def __init__(self, automaton):
+        super().__init__()
+        self.automaton = automaton
+
+    def __missing__(self, index):
+        return self.automaton.expand(index)
+
+class LazyAFD:
+    """
+    AFD built on demand from an ε-NFA (e.g. the union of the rule automata).
+
+    It has the same lookup interface as CompiledAFD (table, class_map, class_of,
+    accepting, tokens, start_state), so the lexer runs over it unchanged. A DFA
+    state (the ε-closure of a set of NFA states) and each of its transitions are only
+    computed the first time the lexer reaches them, so startup does not pay for states
+    the input never visits.
+
+    State ids are only valid until the next flush (counted in 'flushes'). Code that
+    keeps a state between two scans, possibly with other scans over the same automaton
+    in between, must keep its state_key() and get the id back with state_of().
+
+    The state cache is bounded: when it holds 'max_states' states it is flushed and
+    refilled from the current state on. If, between two flushes, most cache misses
+    created a new state (states are hardly ever revisited), the cache is thrashing and
+    the automaton falls back to NFA simulation: transitions are then computed from the
+    NFA states on every step and no longer stored.
+
+    Attributes:
+        num_classes (int): Number of character classes (including class 0).
+        start_state (int): The starting state id (always 0).
+        range_starts (list[int]): Sorted code points where a run of same-class characters begins.
+        range_classes (list[int]): Class id of the run starting at the matching range_starts entry.
+        class_map (dict[str, int]): Cache of character -> class id, filled lazily by class_of().
+        table (LazyTable): Transitions computed so far.
+        accepting (list[int]): 1 for accepting states, 0 otherwise, for the cached states.
+        tokens (list[str | None]): Resolved token of each cached state.
+        max_states (int): Maximum number of cached states.
+        flushes (int): Number of times the cache was flushed.
+        nfa_fallback (bool): True once the automaton has fallen back to NFA simulation.
+    """
+    def __init__(self, nfa, max_states=DEFAULT_MAX_STATES):
+        self.nfa = nfa
+        self.max_states = max(max_states, 2)
+        self.flushes = 0
+        self.nfa_fallback = False
+
+        # Split all labels into disjoint classes, and index the NFA moves by class
+        labels = sorted({symbol for trans in nfa.transitions.values() for symbol in trans if symbol != 'ε'})
+        label_ids = {label: index for index, label in enumerate(labels)}
+        pieces = partition(labels)
+        classes_by_label = [[] for _ in labels]
+        class_ranges = []
+        for class_id, (piece, members) in enumerate(pieces, start=1):
+            class_ranges.extend((low, high, class_id) for low, high in piece.ranges)
+            for label_id in members:
+                classes_by_label[label_id].append(class_id)
+        self.num_classes = len(pieces) + 1
+        self.range_starts, self.range_classes = build_class_ranges(class_ranges)
+
+        self.moves = {}  # NFA state -> {class_id: set of NFA states}
+        for state, trans in nfa.transitions.items():
+            for symbol, dests in trans.items():
+                if symbol == 'ε':
+                    continue
+                for class_id in classes_by_label[label_ids[symbol]]:
+                    self.moves.setdefault(state, {}).setdefault(class_id, set()).update(dests)
+        self.closures = {}  # NFA state -> ε-closure (frozenset)
+
+        self.start_state = 0
+        self.table = LazyTable(self)
+        self.accepting = []
+        self.tokens = []
+        self.keys = []  # state id -> sorted tuple of NFA states
+        self.state_ids = {}
+        self.start_key = tuple(sorted(self.closure(nfa.start_state)))
+        self.add_state(self.start_key)
+        self.misses = 0
+        self.created = 0
+
+        self.class_map = {}
+        for code in range(PRECOMPUTED_CODE_POINTS):
+            self.class_of(chr(code))
+
+    @property
+    def num_states(self):
+        """Number of currently cached states."""
+        return len(self.keys)
+
+    def class_of(self, symbol):
+        """
+        Returns the class id of the character 'symbol', caching it in class_map.
+        """
+        index = bisect_right(self.range_starts, ord(symbol)) - 1
+        class_id = self.range_classes[index] if index >= 0 else OTHER_CLASS
+        self.class_map[symbol] = class_id
+        return class_id
+
+    def next_state(self, state, symbol):
+        """
+        Returns the state reached from 'state' by reading 'symbol', or DEAD_STATE.
+        """
+        class_id = self.class_map.get(symbol)
+        if class_id is None:
+            class_id = self.class_of(symbol)
+        return self.table[state * self.num_classes + class_id]
+
+    def closure(self, state):
+        """Returns (computing it once) the ε-closure of a single NFA state."""
+        closure = self.closures.get(state)
+        if closure is None:
+            closure = {state}
+            stack = [state]
+            while stack:
+                current = stack.pop()
+                for dest in self.nfa.transitions.get(current, {}).get('ε', ()):
+                    if dest not in closure:
+                        closure.add(dest)
+                        stack.append(dest)
+            closure = self.closures[state] = frozenset(closure)
+        return closure
+
+    def add_state(self, key):
+        """
+        Caches the DFA state for the sorted tuple of NFA states 'key'.
+
+        Returns:
+            int: The id of the new state.
+        """
+        nfa = self.nfa
+        state_id = len(self.keys)
+        finals = [s for s in key if s in nfa.final_states]
+        tokenized = [s for s in finals if s in nfa.token_types]
+        self.keys.append(key)
+        self.state_ids[key] = state_id
+        self.accepting.append(1 if finals else 0)
+        if tokenized:
+            best = min(tokenized, key=lambda s: (nfa.token_priorities.get(s, 0), s))
+            self.tokens.append(nfa.token_types[best])
+        else:
+            self.tokens.append(None)
+        return state_id
+
+    def state_key(self, state):
+        """
+        Returns the NFA states of 'state', a key that stays valid across flushes
+        (state ids are reassigned when the cache is flushed, see state_of).
+        """
+        return self.keys[state]
+
+    def state_of(self, key):
+        """
+        Returns the id of the DFA state for the NFA states 'key', caching the state
+        (and flushing the cache first if it is full) if it is not cached.
+        """
+        state = self.state_ids.get(key)
+        if state is None:
+            if len(self.keys) >= self.max_states:
+                self.flush()
+                state = self.state_ids.get(key)  # only the start state is left
+                if state is not None:
+                    return state
+            state = self.add_state(key)
+        return state
+
+    def expand(self, index):
+        """
+        Computes the transition table entry 'index' (state * num_classes + class_id).
+
+        Returns:
+            int: The target state id, or DEAD_STATE.
+        """
+        state, class_id = divmod(index, self.num_classes)
+        self.misses += 1
+
+        reachable = set()
+        if class_id != OTHER_CLASS:
+            moves = self.moves
+            for nfa_state in self.keys[state]:
+                state_moves = moves.get(nfa_state)
+                if state_moves and class_id in state_moves:
+                    reachable.update(state_moves[class_id])
+        if not reachable:
+            target = DEAD_STATE
+        else:
+            closure = set()
+            for nfa_state in reachable:
+                closure |= self.closure(nfa_state)
+            key = tuple(sorted(closure))
+            target = self.state_ids.get(key)
+            if target is None:
+                flushes = self.flushes
+                target = self.state_of(key)
+                if self.flushes != flushes:
+                    return target  # 'state' did not survive the flush, so the entry is not stored
+                self.created += 1
+
+        if not self.nfa_fallback:
+            self.table[index] = target
+        return target
+
+    def flush(self):
+        """
+        Drops every cached state except the start state, and switches to NFA
+        simulation if the cache was thrashing.
+        """
+        if self.created > THRASH_RATIO * self.misses:
+            self.nfa_fallback = True
+        self.flushes += 1
+        self.misses = 0
+        self.created = 0
+
+        self.table.clear()
+        del self.keys[1:]
+        del self.accepting[1:]
+        del self.tokens[1:]
+        self.state_ids = {self.start_key: 0}
+
+    def __str__(self):
+        """Returns a human-readable summary of the lazy automaton."""
+        lines = ["LazyAFD:"]
+        lines.append(f"Cached states: {self.num_states} (max {self.max_states})")
+        lines.append(f"Classes: {self.num_classes}")
+        lines.append(f"Flushes: {self.flushes}")
+        lines.append(f"NFA fallback: {self.nfa_fallback}")
+        return "\n".join(lines)
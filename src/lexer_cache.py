@@ -0,0 +1,75 @@
+import hashlib
+import os
+from compiled_afd import CompiledAFD
+from version import __version__
+
+CACHE_DIR = "../.lexer_cache"
+
+def cache_key(definitions):
+    """
+    Computes the cache key of a set of regular expression definitions.
+
+    The key is a SHA-256 hash of the tool version and the definitions text, so that
+    any change to either invalidates previously cached automata.
+
+    Args:
+        definitions (str): The full content of the regular expression definition file.
+
+    Returns:
+        str: The hexadecimal cache key.
+    """
+    digest = hashlib.sha256()
+    digest.update(__version__.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(definitions.encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_path(key, cache_dir=CACHE_DIR):
+    """Returns the path of the cache entry for 'key'."""
+    return os.path.join(cache_dir, f"{key}.afdb")
+
+def load(key, cache_dir=CACHE_DIR):
+    """
+    Loads a compiled lexer automaton from the cache.
+
+    The entry is memory-mapped (see CompiledAFD.load_binary), so loading does not
+    depend on the size of the automaton.
+
+    Args:
+        key (str): The cache key (see cache_key).
+        cache_dir (str): Directory holding the cache entries.
+
+    Returns:
+        CompiledAFD | None: The cached automaton, or None on a cache miss or an
+                            unreadable entry.
+    """
+    try:
+        return CompiledAFD.load_binary(cache_path(key, cache_dir))
+    except (OSError, ValueError):
+        return None
+
+def store(key, automaton, cache_dir=CACHE_DIR):
+    """
+    Stores a compiled lexer automaton in the cache.
+
+    The entry is written to a temporary file first and then renamed, so concurrent
+    processes never observe a partially written entry. Failures (e.g. a read-only
+    file system) are ignored: the cache is only an optimization.
+
+    Args:
+        key (str): The cache key (see cache_key).
+        automaton (CompiledAFD): The automaton to store.
+        cache_dir (str): Directory holding the cache entries.
+
+    Returns:
+        bool: True if the entry was written.
+    """
+    path = cache_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        automaton.save_binary(tmp_path)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,313 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import StageRecord, profile_stage
+import regular_expression as re
+from compiled_afd import CompiledAFD
+from lazy_afd import LazyAFD, DEFAULT_MAX_STATES
+import syntax_tree as st
+import afn
+import automaton_operations as ao
+from lexer_simulation import Lexer, compile_automaton
+
+def parse_definitions(definitions):
+    """
+    Parses regular expression definitions.
+
+    Args:
+        definitions (str | Iterable[str | RegularExpression]): Either the text of a
+            definition file (one "name: pattern" per line), or an iterable of such lines
+            and/or RegularExpression instances. Blank lines are ignored.
+
+    Returns:
+        List[RegularExpression]: The parsed definitions, in order.
+    """
+    if isinstance(definitions, str):
+        definitions = definitions.splitlines()
+
+    regular_expressions = []
+    for definition in definitions:
+        if isinstance(definition, re.RegularExpression):
+            regular_expressions.append(definition)
+        elif definition.strip():
+            regular_expressions.append(re.RegularExpression.from_definition_line(definition.strip()))
+    return regular_expressions
+
+def build_rule_afd(regex, log=None, profiler=None):
+    """
+    Builds the AFD of a single regular expression (postfix, syntax tree, followpos, AFD).
+
+    Args:
+        regex (RegularExpression): The rule to compile.
+        log (callable, optional): Receives a progress message for every stage.
+        profiler (Profiler, optional): Records every stage, attributed to the rule.
+
+    Returns:
+        AFD: The rule's deterministic automaton.
+    """
+    log = log or (lambda msg: None)
+
+    log("#1.Tokenize and create postfix format for regular expression")
+    with profile_stage(profiler, "to_postfix", regex.name):
+        postfix = regex.to_postfix(regex.pattern)
+    log("     RegEx to Postfix done.")
+
+    log("#2.Build syntax tree")
+    with profile_stage(profiler, "build_syntax_tree", regex.name) as record:
+        tree = st.SyntaxTree(postfix)
+        root = tree.build_syntax_tree()
+        record.sizes["positions"] = len(tree.leaf_positions)
+    log("     Build Syntax Tree done.")
+
+    log("#3.Computing nullable, firstpos, lastpos, and followpos")
+    with profile_stage(profiler, "compute_nullable_first_last_follow", regex.name) as record:
+        followpos = tree.compute_nullable_first_last_follow(root)
+        if profiler is not None:
+            record.sizes["followpos_entries"] = sum(len(follow) for follow in followpos.values())
+    log("     Nullable, firstpos, lastpos, and followpos done.")
+
+    log("#4.Build AFD")
+    with profile_stage(profiler, "build_afd", regex.name) as record:
+        afd = st.build_afd(root, followpos, tree.leaf_positions)
+        if profiler is not None:
+            record_afd_sizes(record, afd)
+    log("     AFD built.")
+    return afd
+
+def record_afd_sizes(record, afd):
+    """Adds the number of states and transitions of 'afd' to a stage record."""
+    record.sizes["dfa_states"] = len(afd.transitions)
+    record.sizes["dfa_transitions"] = sum(len(trans) for trans in afd.transitions.values())
+
+def compile_rule(regex, export_dir=None, name=None):
+    """
+    Compiles one rule to its minimized automaton, in the compact binary format.
+
+    This is the unit of work of the parallel mode of build_automaton: it runs in a
+    worker process, and both its arguments and its result are cheap to pickle.
+
+    Args:
+        regex (RegularExpression): The rule to compile.
+        export_dir (str, optional): If set, the rule's AFD is also written there as name.txt/.bin.
+        name (str, optional): Base name of the exported files.
+
+    Returns:
+        tuple[bytes, float]: The rule's automaton, as written by CompiledAFD.to_bytes(),
+                             and the time it took to build, in seconds.
+    """
+    start = time.perf_counter()
+    afd = build_rule_afd(regex)
+    export_afd(afd, export_dir, name, lambda msg: None)
+    data = compile_automaton(afd).to_bytes()
+    return data, time.perf_counter() - start
+
+def build_rule_afns_parallel(regular_expressions, workers, export_dir=None, log=None, profiler=None):
+    """
+    Compiles every rule in a process pool and converts the results to AFNs for the union.
+
+    Args:
+        regular_expressions (List[RegularExpression]): The token rules, in order.
+        workers (int): Number of worker processes (0 for one per CPU).
+        export_dir (str, optional): Directory for per-rule AFD debug artifacts.
+        log (callable, optional): Receives a progress message for every stage.
+        profiler (Profiler, optional): Records the pool run and the time of every rule
+                                       (measured in the workers, without memory).
+
+    Returns:
+        List[AFN]: One AFN per rule, in rule order, with the rule name as token type.
+    """
+    log = log or (lambda msg: None)
+    workers = workers or os.cpu_count() or 1
+    names = [f"afd_output_{i}" for i in range(len(regular_expressions))]
+    # Hand out rules in batches so that hundreds of small rules do not pay one round trip each
+    chunksize = max(1, len(regular_expressions) // (4 * workers))
+
+    log(f"#1-4.Compiling {len(regular_expressions)} rules in {workers} processes")
+    with profile_stage(profiler, "compile_rules_parallel") as record:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(compile_rule, regular_expressions,
+                                        [export_dir] * len(names), names, chunksize=chunksize))
+        record.sizes["rules"] = len(regular_expressions)
+        record.sizes["workers"] = workers
+    log("     Rule AFDs built.")
+
+    if profiler is not None:
+        for regex, (_, seconds) in zip(regular_expressions, results):
+            rule_record = StageRecord("compile_rule", regex.name)
+            rule_record.seconds = seconds
+            profiler.add(rule_record)
+
+    return [afn.AFN.from_compiled(CompiledAFD.from_buffer(data), token_type=regex.name)
+            for regex, (data, _) in zip(regular_expressions, results)]
+
+def build_automaton(regular_expressions, export_dir=None, log=None, single_pass=True, workers=None,
+                    lazy=False, max_states=DEFAULT_MAX_STATES, profiler=None):
+    """
+    Runs the whole construction pipeline in memory and returns the lexer automaton.
+
+    By default, all rules are combined into one syntax tree (r1#0)|(r2#1)|... and the
+    tokenizing AFD is built from it in a single followpos pass. With single_pass=False,
+    every rule is compiled to its own AFD, converted to an AFN with AFN.from_afd, and the
+    union of all AFNs (AutomatonOperations.union_all) is determinized again. Either way
+    the result is compiled and minimized, and earlier rules take priority. Nothing is
+    written to disk unless 'export_dir' is given.
+
+    With 'workers', the rules are compiled independently in a ProcessPoolExecutor
+    (see compile_rule) and joined with union_all; this implies single_pass=False, and
+    only pays off when single rules are expensive to determinize.
+
+    With 'lazy', the union ε-NFA is not determinized up front: a LazyAFD builds the DFA
+    states the lexer actually reaches, keeping at most 'max_states' of them cached.
+    This also implies single_pass=False.
+
+    Args:
+        regular_expressions (List[RegularExpression]): The token rules, in order.
+        export_dir (str, optional): If set, the AFD is also written there as afd_output.txt
+                                    and afd_output.bin (afd_output_{i}.* per rule when
+                                    single_pass is False), as debug artifacts.
+        log (callable, optional): Receives a progress message for every stage.
+        single_pass (bool): Build the final AFD directly from the combined syntax tree.
+        workers (int, optional): Compile the rules in this many processes (0 for one per CPU).
+        lazy (bool): Return a LazyAFD over the union ε-NFA instead of a CompiledAFD.
+        max_states (int): Size of the LazyAFD state cache.
+        profiler (Profiler, optional): Records time, memory and sizes of every stage
+                                       (see instrumentation).
+
+    Returns:
+        CompiledAFD | LazyAFD: The automaton used by the lexer.
+    """
+    log = log or (lambda msg: None)
+
+    if workers is not None:
+        afns = build_rule_afns_parallel(regular_expressions, workers, export_dir, log, profiler)
+    elif single_pass and not lazy:
+        afd = build_combined_afd(regular_expressions, log, profiler)
+        export_afd(afd, export_dir, "afd_output", log)
+        return compile_and_record(afd, None, profiler)
+    else:
+        afns = []
+        for i, regex in enumerate(regular_expressions):
+            afd = build_rule_afd(regex, log, profiler)
+            export_afd(afd, export_dir, f"afd_output_{i}", log)
+            afns.append(afn.AFN.from_afd(afd, token_type=regex.name))
+
+    log("#5.Union with epsilon transitions")
+    with profile_stage(profiler, "union") as record:
+        union_afn = ao.AutomatonOperations.union_all(afns)
+        record.sizes["union_nfa_states"] = len(union_afn.states)
+    if lazy:
+        log("     Union done, AFD states will be built on demand.")
+        return LazyAFD(union_afn, max_states)
+    with profile_stage(profiler, "to_afd") as record:
+        afd, token_map = union_afn.to_afd()
+        if profiler is not None:
+            record_afd_sizes(record, afd)
+    log("     Union done.")
+
+    return compile_and_record(afd, token_map, profiler)
+
+def compile_and_record(afd, token_map, profiler):
+    """Compiles and minimizes 'afd' (see compile_automaton) as the "compile" stage."""
+    with profile_stage(profiler, "compile") as record:
+        automaton = compile_automaton(afd, token_map)
+        record.sizes["states"] = automaton.num_states
+        record.sizes["classes"] = automaton.num_classes
+    return automaton
+
+def build_combined_afd(regular_expressions, log=None, profiler=None):
+    """
+    Builds the tokenizing AFD of all rules at once, from the combined syntax tree
+    (see SyntaxTree.combine_rules and syntax_tree.build_tokenizing_afd).
+
+    Args:
+        regular_expressions (List[RegularExpression]): The token rules, in priority order.
+        log (callable, optional): Receives a progress message for every stage.
+        profiler (Profiler, optional): Records every stage. Since the tree is shared, each
+                                       rule only gets its share of positions and followpos
+                                       entries (see record_rule_shares).
+
+    Returns:
+        AFD: The tokenizing automaton, with token_map mapping each accepting state to its token.
+    """
+    log = log or (lambda msg: None)
+
+    log("#1.Tokenize and create postfix format for regular expressions")
+    with profile_stage(profiler, "to_postfix") as record:
+        postfixes = [regex.to_postfix(regex.pattern) for regex in regular_expressions]
+        record.sizes["rules"] = len(postfixes)
+    log("     RegEx to Postfix done.")
+
+    log("#2.Build combined syntax tree")
+    with profile_stage(profiler, "build_syntax_tree") as record:
+        tree = st.SyntaxTree(st.SyntaxTree.combine_rules(postfixes))
+        root = tree.build_syntax_tree()
+        record.sizes["positions"] = len(tree.leaf_positions)
+    log("     Build Syntax Tree done.")
+
+    log("#3.Computing nullable, firstpos, lastpos, and followpos")
+    with profile_stage(profiler, "compute_nullable_first_last_follow") as record:
+        followpos = tree.compute_nullable_first_last_follow(root)
+        if profiler is not None:
+            record.sizes["followpos_entries"] = sum(len(follow) for follow in followpos.values())
+    log("     Nullable, firstpos, lastpos, and followpos done.")
+
+    log("#4.Build tokenizing AFD")
+    with profile_stage(profiler, "build_afd") as record:
+        afd = st.build_tokenizing_afd(root, followpos, tree.leaf_positions, tree.end_markers,
+                                      [regex.name for regex in regular_expressions])
+        if profiler is not None:
+            record_afd_sizes(record, afd)
+    log("     AFD built.")
+
+    if profiler is not None:
+        record_rule_shares(profiler, regular_expressions, tree, followpos)
+    return afd
+
+def record_rule_shares(profiler, regular_expressions, tree, followpos):
+    """
+    Records the positions and followpos entries of each rule of a combined tree, as
+    untimed "rule_share" records (the stages of a combined tree are shared, so their
+    time cannot be split by rule). Leaves of rule i lie between end markers i-1 and i.
+    """
+    rule_of_marker = {rule: position for position, rule in tree.end_markers.items()}
+    previous = 0
+    for rule, regex in enumerate(regular_expressions):
+        marker = rule_of_marker[rule]
+        positions = range(previous + 1, marker + 1)
+        record = StageRecord("rule_share", regex.name)
+        record.seconds = None
+        record.sizes["positions"] = len(positions)
+        record.sizes["followpos_entries"] = sum(len(followpos[p]) for p in positions)
+        profiler.add(record)
+        previous = marker
+
+def export_afd(afd, export_dir, name, log):
+    """Writes 'afd' to export_dir as name.txt and name.bin, if export_dir is set."""
+    if export_dir is None:
+        return
+    afd.export_to_txt(os.path.join(export_dir, f"{name}.txt"))
+    compile_automaton(afd).save_binary(os.path.join(export_dir, f"{name}.bin"))
+    log(f"     File saved: {os.path.join(export_dir, f'{name}.txt')}")
+
+def compile_lexer(definitions, export_dir=None, log=None, workers=None, lazy=False, profiler=None,
+                  single_pass=True):
+    """
+    Compiles token definitions into a ready-to-use Lexer, without touching disk.
+
+    Args:
+        definitions (str | Iterable[str | RegularExpression]): The token rules
+            (see parse_definitions).
+        export_dir (str, optional): Directory for per-rule AFD debug artifacts.
+        log (callable, optional): Receives a progress message for every stage.
+        workers (int, optional): Compile the rules in parallel (see build_automaton).
+        lazy (bool): Build the AFD on demand while lexing (see build_automaton).
+        profiler (Profiler, optional): Records the cost of every stage (see instrumentation).
+        single_pass (bool): Build the AFD from one combined syntax tree (see build_automaton).
+
+    Returns:
+        Lexer: A lexer over the compiled automaton.
+
+    E.g.: compile_lexer(["id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [0-9]+"]).tokenize("x1 42")
+    """
+    return Lexer(build_automaton(parse_definitions(definitions), export_dir, log, single_pass, workers=workers,
+                                 lazy=lazy, profiler=profiler))
@@ -1,67 +1,116 @@
+import codecs
+import io
+import mmap
+import os
+import re
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from compiled_afd import CompiledAFD, NO_TOKEN
+from batch_lexer import classify_lines
+from incremental_lexer import IncrementalLexer
+from lazy_afd import LazyAFD
+from utf8_automaton import build_byte_automaton, tokenize_bytes
+from diagnostics import LexicalError, LineTracker
+from automaton_operations import AutomatonOperations
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_PARALLEL_CHUNK_BYTES = 16 * 1024 * 1024
+DEFAULT_DELIMITERS = b'\n'
 
-def simulate_dfa_on_text(dfa, token_map, text):
+worker_automaton = None  # automaton of the current lexing worker process (see init_lex_worker)
+
+def compile_automaton(dfa, token_map=None):
+    """
+    Returns the compiled (dense table) form of 'dfa', compiling it if needed.
+
+    AFDs are minimized right after compilation, so the lexer always runs over
+    the smallest equivalent table. The result is cached on the AFD (for the same
+    token_map), so passing the same AFD to the simulate functions again does not
+    recompile it.
+
+    Parameters:
+        dfa: An AFD, or an already compiled CompiledAFD or LazyAFD (returned as is).
+        token_map: dict mapping accepting DFA states to token names (ignored for CompiledAFD).
+
+    Returns:
+        CompiledAFD | LazyAFD: The automaton the lexer runs over.
+    """
+    if isinstance(dfa, (CompiledAFD, LazyAFD)):
+        return dfa
+    if dfa.compiled is not None and dfa.compiled[0] == token_map:
+        return dfa.compiled[1]
+    automaton = AutomatonOperations.minimize(CompiledAFD.from_afd(dfa, token_map))
+    dfa.compiled = (dict(token_map) if token_map is not None else None, automaton)
+    return automaton
+
+def simulate_dfa_on_text(dfa, token_map, text, on_error=None):
     """
     Simulates a DFA over an entire input text, returning a list of recognized tokens.
 
     This function:
-    - Traverses the input string using the DFA transitions.
+    - Traverses the input string using the compiled DFA transition table.
     - Tracks the last accepting state to ensure maximal munch (longest match).
     - Associates each recognized lexeme with its corresponding token.
-    - If no accepting state is found, it marks the lexeme as an error.
+    - If no accepting state is found, it marks the lexeme as an error and, if an
+      error sink is given, reports it as a LexicalError.
 
     Parameters:
-        dfa: An object with attributes:
-            - start_state: initial DFA state
-            - transitions: dict[state][symbol] -> next_state
-            - accept_states: set of accepting states
-        token_map: dict mapping DFA states to token names
+        dfa: An AFD (compiled on first use, see compile_automaton) or a CompiledAFD.
+        token_map: dict mapping accepting DFA states to token names
         text (str): the complete input program as a single string
+        on_error (callable, optional): error sink, called with a LexicalError for every
+                                       character that starts no token (see diagnostics)
 
     Returns:
         List[Tuple[str, str]]: A list of (lexeme, token) tuples, where token is either a valid name or "erro!".
     """
+    automaton = compile_automaton(dfa, token_map)
+    table = automaton.table
+    class_map = automaton.class_map
+    num_classes = automaton.num_classes
+    accepting = automaton.accepting
+    state_tokens = automaton.tokens
+    start_state = automaton.start_state
+
+    line_tracker = LineTracker() if on_error is not None else None
+
     i = 0
+    length = len(text)
     tokens = []
 
-    while i < len(text):
-        state = dfa.start_state
-        last_accepting = None
+    while i < length:
+        state = start_state
+        last_token = None
         last_accepting_index = i
         current_index = i
 
-        while current_index < len(text):
+        while current_index < length:
             symbol = text[current_index]
-            #print(f"Reading symbol: '{symbol}' from state {state}")
+            class_id = class_map.get(symbol)
+            if class_id is None:
+                class_id = automaton.class_of(symbol)
+            next_state = table[state * num_classes + class_id]
 
-            if symbol not in dfa.transitions.get(state, {}):
-                print(f" No transition for symbol '{symbol}' from state {state}")
+            if next_state < 0:
                 break
 
-            state = dfa.transitions[state][symbol]
-            #print(f"Transition to state {state}")
-
-            if state in dfa.accept_states:
-                last_accepting = state
-                last_accepting_index = current_index + 1
-
+            state = next_state
             current_index += 1
 
-        if last_accepting is not None:
-            lexeme = text[i:last_accepting_index]
+            if accepting[state]:
+                last_token = state_tokens[state]
+                last_accepting_index = current_index
 
-            token = None
-            for substate in sorted(last_accepting):
-                if substate in token_map:
-                    token = token_map[substate]
-                    break
-
-            if token is None:
-                token = "erro!"
-
-            tokens.append((lexeme, token))
+        if last_accepting_index > i:
+            lexeme = text[i:last_accepting_index]
+            tokens.append((lexeme, last_token or "erro!"))
             i = last_accepting_index
         else:
+            if on_error is not None:
+                line, column = line_tracker.locate(text, i)
+                on_error(LexicalError(i, line, column, text[i]))
             tokens.append((text[i], "erro!"))
             i += 1
 
@@ -77,59 +126,719 @@ def simulate_dfa_on_line(dfa, token_map, line):
     - If no valid path exists or final state is not accepting, returns "erro!".
 
     Parameters:
-        dfa: An object with attributes:
-            - start_state
-            - transitions: dict[state][symbol] -> next_state
-            - accept_states: set of accepting states
-        token_map: dict mapping DFA sub-states to token names
+        dfa: An AFD (compiled on first use, see compile_automaton) or a CompiledAFD.
+        token_map: dict mapping accepting DFA states to token names
         line (str): a single line of input
 
     Returns:
         Tuple[str, str]: (line, token) if accepted; otherwise (line, "erro!")
     """
-    state = dfa.start_state
-    i = 0
-    while i < len(line):
-        symbol = line[i]
-        if symbol not in dfa.transitions.get(state, {}):
+    automaton = compile_automaton(dfa, token_map)
+    table = automaton.table
+    class_map = automaton.class_map
+    num_classes = automaton.num_classes
+
+    state = automaton.start_state
+    for symbol in line:
+        class_id = class_map.get(symbol)
+        if class_id is None:
+            class_id = automaton.class_of(symbol)
+        state = table[state * num_classes + class_id]
+        if state < 0:
             return (line, "erro!")
-        state = dfa.transitions[state][symbol]
-        i += 1
-
-    if state in dfa.accept_states:
-        # Token resolution: check which original substate this final DFA state includes
-        token = None
-        for substate in sorted(state):
-            if substate in token_map:
-                token = token_map[substate]
-                break
-        return (line, token or "erro!")
+
+    if automaton.accepting[state]:
+        return (line, automaton.tokens[state] or "erro!")
     else:
         return (line, "erro!")
 
-def run_lexer(dfa, token_map, input_text_path, output_token_path):
+def tokenize_stream(dfa, token_map, stream, chunk_size=DEFAULT_CHUNK_SIZE, skip_whitespace=False, on_error=None):
+    """
+    Tokenizes a text stream with maximal munch, reading it in fixed-size chunks.
+
+    This function:
+    - Applies the same longest-match logic as simulate_dfa_on_text.
+    - Reads the stream chunk by chunk, only keeping the current chunk and the
+      pending (not yet finished) lexeme in memory.
+    - Resumes the DFA where it stopped when a lexeme crosses a chunk boundary.
+    - Yields tokens as soon as they are recognized.
+
+    Parameters:
+        dfa: An AFD (compiled on first use, see compile_automaton) or a CompiledAFD.
+        token_map: dict mapping accepting DFA states to token names
+        stream: a text file-like object with a read(size) method
+        chunk_size (int): number of characters read at a time
+        skip_whitespace (bool): if True, whitespace characters that do not start a
+                                token are skipped instead of reported as "erro!"
+        on_error (callable, optional): error sink, called with a LexicalError for every
+                                       "erro!" character (see diagnostics)
+
+    Yields:
+        Tuple[str, str, int]: (lexeme, token, offset), where offset is the character
+                              position of the lexeme in the stream.
+    """
+    automaton = compile_automaton(dfa, token_map)
+    table = automaton.table
+    class_map = automaton.class_map
+    num_classes = automaton.num_classes
+    accepting = automaton.accepting
+    state_tokens = automaton.tokens
+    start_state = automaton.start_state
+    read = stream.read
+    line_tracker = LineTracker() if on_error is not None else None
+
+    buffer = read(chunk_size)
+    eof = not buffer
+    base = 0  # stream offset of buffer[0]
+    i = 0
+
+    while True:
+        if i >= len(buffer):
+            if eof:
+                return
+            if line_tracker is not None:
+                line_tracker.advance(buffer, len(buffer), base)
+            base += len(buffer)
+            buffer = read(chunk_size)
+            i = 0
+            if not buffer:
+                return
+            continue
+
+        state = start_state
+        last_token = None
+        last_accepting_index = i
+        current_index = i
+
+        while True:
+            length = len(buffer)
+            while current_index < length:
+                symbol = buffer[current_index]
+                class_id = class_map.get(symbol)
+                if class_id is None:
+                    class_id = automaton.class_of(symbol)
+                next_state = table[state * num_classes + class_id]
+                if next_state < 0:
+                    break
+
+                state = next_state
+                current_index += 1
+
+                if accepting[state]:
+                    last_token = state_tokens[state]
+                    last_accepting_index = current_index
+            else:
+                # Reached the end of the buffer with the DFA still alive:
+                # keep the pending lexeme, append the next chunk and resume.
+                if not eof:
+                    chunk = read(chunk_size)
+                    if chunk:
+                        if line_tracker is not None:
+                            line_tracker.advance(buffer, i, base)
+                        buffer = buffer[i:] + chunk
+                        base += i
+                        current_index -= i
+                        last_accepting_index -= i
+                        i = 0
+                        continue
+                    eof = True
+            break
+
+        if last_accepting_index > i:
+            yield (buffer[i:last_accepting_index], last_token or "erro!", base + i)
+            i = last_accepting_index
+        else:
+            if not (skip_whitespace and buffer[i].isspace()):
+                if on_error is not None:
+                    line, column = line_tracker.locate(buffer, i, base)
+                    on_error(LexicalError(base + i, line, column, buffer[i]))
+                yield (buffer[i], "erro!", base + i)
+            i += 1
+
+def iter_tokens_from(automaton, path, start, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Tokenizes a UTF-8 file from a byte offset on, with byte offsets.
+
+    Every character is covered by exactly one result (whitespace that starts no token
+    comes out as a one-character "erro!" result), so each result starts at a point
+    where the lexer restarts from the start state.
+
+    Parameters:
+        automaton (CompiledAFD): The compiled automaton.
+        path (str): Path to the input file.
+        start (int): Byte offset to start at; must be a character boundary.
+        chunk_size (int): number of characters read at a time.
+
+    Yields:
+        Tuple[str, str, int, int]: (lexeme, token, start, end) with byte offsets in the file.
+    """
+    with open(path, 'rb') as raw:
+        raw.seek(start)
+        stream = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        offset = start
+        for lexeme, token, _ in tokenize_stream(automaton, None, stream, chunk_size):
+            end = offset + (len(lexeme) if lexeme.isascii() else len(lexeme.encode('utf-8')))
+            yield (lexeme, token, offset, end)
+            offset = end
+
+def init_lex_worker(automaton_path):
+    """
+    Maps the automaton once per worker process (ProcessPoolExecutor initializer).
+
+    The workers map the same binary file (see CompiledAFD.load_binary), so they share
+    its pages instead of each holding a copy of the tables.
+    """
+    global worker_automaton
+    worker_automaton = CompiledAFD.load_binary(automaton_path)
+
+def lex_range(path, start, stop, skip_whitespace=True):
+    """
+    Tokenizes the file from byte 'start' until the first token starting at or after 'stop'.
+
+    Runs in a worker process (see tokenize_file_parallel). The last token returned may
+    extend past 'stop'. Tokens are returned as arrays of offsets and token ids, which
+    are much cheaper to send back to the parent than tuples of strings; the parent
+    reads the lexemes from the file itself.
+
+    Returns:
+        Tuple[array, array, array, int]: The byte offsets where the tokens start and end,
+            relative to 'start', their token ids (indexes into automaton.token_ids()[0],
+            or NO_TOKEN for "erro!"), and the byte offset where the next token starts
+            (the end of the file if none).
+    """
+    names, _ = worker_automaton.token_ids()
+    name_ids = {name: token_id for token_id, name in enumerate(names)}
+    starts = array('I')
+    ends = array('I')
+    token_ids = array('i')
+    end = start
+    for lexeme, token, offset, end in iter_tokens_from(worker_automaton, path, start):
+        if offset >= stop:
+            return starts, ends, token_ids, offset
+        if not (skip_whitespace and token == "erro!" and lexeme.isspace()):
+            starts.append(offset - start)
+            ends.append(end - start)
+            token_ids.append(name_ids.get(token, NO_TOKEN))
+    return starts, ends, token_ids, end
+
+def find_resync_points(path, chunk_bytes, delimiters=DEFAULT_DELIMITERS):
+    """
+    Splits a file into byte ranges that start right after a delimiter byte.
+
+    Parameters:
+        path (str): Path to the input file.
+        chunk_bytes (int): Approximate size of each range.
+        delimiters (bytes): ASCII bytes after which the lexer can restart (e.g. b'\\n' or b' \\t\\n').
+
+    Returns:
+        List[int]: Increasing start offsets, beginning with 0 and ending with the file size.
+
+    Raises:
+        ValueError: If a delimiter is not ASCII (it could be part of a multibyte character).
+    """
+    if not delimiters or not delimiters.isascii():
+        raise ValueError("Resynchronization delimiters must be ASCII bytes.")
+    size = os.path.getsize(path)
+    points = [0]
+    if size == 0:
+        return points
+    pattern = re.compile(b'[' + b''.join(re.escape(bytes([d])) for d in delimiters) + b']')
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        nominal = chunk_bytes
+        while nominal < size:
+            match = pattern.search(data, nominal)  # one scan for all delimiters
+            if match is None:
+                break
+            point = match.end()
+            if point >= size:
+                break
+            points.append(point)
+            nominal = point + chunk_bytes
+    points.append(size)
+    return points
+
+def tokenize_file_parallel(dfa, token_map, path, workers=None, chunk_bytes=DEFAULT_PARALLEL_CHUNK_BYTES,
+                           delimiters=DEFAULT_DELIMITERS, skip_whitespace=True):
+    """
+    Tokenizes a large UTF-8 file on several cores, with the same result as tokenize_stream.
+
+    This function:
+    - Splits the file into byte ranges starting right after a delimiter byte
+      (find_resync_points), and lexes every range speculatively in a worker process,
+      from the start of the range up to the first token at or after its end.
+    - Merges the ranges in order. A range is accepted from the point where the merged
+      output stops: if that point is a token boundary of the range too, the rest of
+      the range is identical to a sequential run. Otherwise (a token straddled the
+      delimiter), tokens are re-lexed sequentially from that point until the
+      boundaries line up again.
+    - Keeps at most two ranges per worker in flight, so memory does not grow with the file.
+    - Writes the automaton once to a temporary binary file that every worker maps.
+
+    Parameters:
+        dfa: An AFD (compiled on first use, see compile_automaton) or a CompiledAFD.
+        token_map: dict mapping accepting DFA states to token names
+        path (str): Path to the input file.
+        workers (int, optional): Number of worker processes (default: one per CPU).
+        chunk_bytes (int): Approximate size of the range handed to each task.
+        delimiters (bytes): ASCII bytes after which ranges may start.
+        skip_whitespace (bool): skip whitespace that does not start a token (see tokenize_stream).
+
+    Yields:
+        Tuple[str, str, int]: (lexeme, token, offset), where offset is the byte position
+                              of the lexeme in the file.
+
+    Raises:
+        ValueError: If the automaton is a LazyAFD, which cannot be shared with the workers.
+    """
+    automaton = compile_automaton(dfa, token_map)
+    if isinstance(automaton, LazyAFD):
+        raise ValueError("Parallel tokenization requires a compiled automaton, not a LazyAFD.")
+    points = find_resync_points(path, chunk_bytes, delimiters)
+    if len(points) < 2:
+        return  # empty file
+    workers = workers or os.cpu_count() or 1
+    names = automaton.token_ids()[0]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The workers map this file instead of unpickling their own copy of the tables
+        automaton_path = os.path.join(temp_dir, "automaton.afdb")
+        automaton.save_binary(automaton_path)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                ProcessPoolExecutor(max_workers=workers, initializer=init_lex_worker,
+                                    initargs=(automaton_path,)) as executor:
+            pending = deque()
+            next_range = 0
+            position = 0  # where the merged output continues
+            while next_range < len(points) - 1 or pending:
+                while next_range < len(points) - 1 and len(pending) < 2 * workers:
+                    range_start = points[next_range]
+                    pending.append((range_start, executor.submit(lex_range, path, range_start,
+                                                                 points[next_range + 1], skip_whitespace)))
+                    next_range += 1
+
+                range_start, future = pending.popleft()
+                starts, ends, token_ids, range_end = future.result()
+                if position >= range_end:
+                    continue  # already covered by a token of an earlier range
+
+                # Skip the tokens that end before the merge point (offsets are relative to range_start)
+                count = len(starts)
+                index = 0
+                while index < count and ends[index] <= position - range_start:
+                    index += 1
+
+                relexed = None
+                while index < count and starts[index] < position - range_start:
+                    # The merge point falls inside a speculative token: re-lex sequentially
+                    if relexed is None:
+                        relexed = iter_tokens_from(automaton, path, position)
+                    lexeme, token, offset, position = next(relexed, (None, None, None, range_end))
+                    if lexeme is not None and not (skip_whitespace and token == "erro!" and lexeme.isspace()):
+                        yield (lexeme, token, offset)
+                    while index < count and ends[index] <= position - range_start:
+                        index += 1
+                    if position >= range_end:
+                        break
+                else:
+                    for index in range(index, count):
+                        token_id = token_ids[index]
+                        start = range_start + starts[index]
+                        yield (data[start:range_start + ends[index]].decode('utf-8'),
+                               names[token_id] if token_id != NO_TOKEN else "erro!", start)
+                    position = range_end
+
+def run_lexer(dfa, token_map, input_text_path, output_token_path, streaming=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+              on_error=None):
     """
     Runs the lexer using the DFA on an input file and writes token output to another file.
 
     This function:
-    - Reads and strips lines from the input text file.
-    - Simulates DFA execution line by line.
+    - Compiles the DFA into its dense table form once.
+    - By default, reads and strips lines from the input text file and checks each line
+      for full acceptance (each line must be a single lexeme), all lines in one batch
+      (see batch_lexer.classify_lines).
+    - In streaming mode, tokenizes the whole file as a character stream with
+      tokenize_stream, skipping whitespace between tokens and writing each token
+      as soon as it is recognized, so memory use does not grow with the input size.
+    - With 'workers', tokenizes the file as a stream too, but on several processes
+      (see tokenize_file_parallel).
     - Writes results in the format <lexeme, token> per line in the output file.
 
     Parameters:
-        dfa: The DFA used for simulation, with start_state, transitions, and accept_states.
-        token_map: dict mapping DFA states or substates to token names.
+        dfa: The DFA used for simulation (an AFD or a CompiledAFD).
+        token_map: dict mapping accepting DFA states to token names.
         input_text_path (str): path to the input file containing program text.
         output_token_path (str): path to the output file where results will be written.
+        streaming (bool): tokenize the input as a character stream instead of line by line.
+        chunk_size (int): number of characters read at a time in streaming mode.
+        workers (int, optional): number of processes for parallel streaming (0 = one per CPU).
+        on_error (callable, optional): error sink for streaming mode (see tokenize_stream).
+
+    Returns:
+        int: The number of tokens written.
     """
+    automaton = compile_automaton(dfa, token_map)
+    count = 0
+
+    if workers is not None:
+        with open(output_token_path, 'w') as out:
+            for lexeme, token, _ in tokenize_file_parallel(automaton, token_map, input_text_path, workers):
+                out.write(f"<{lexeme}, {token}>\n")
+                count += 1
+        return count
+
+    if streaming:
+        with open(input_text_path, 'r', encoding='utf-8') as f, open(output_token_path, 'w') as out:
+            for lexeme, token, _ in tokenize_stream(automaton, token_map, f, chunk_size, skip_whitespace=True, on_error=on_error):
+                out.write(f"<{lexeme}, {token}>\n")
+                count += 1
+        return count
+
     with open(input_text_path, 'r') as f:
         lines = [line.strip() for line in f if line.strip()]
 
-    tokens = []
-    for line in lines:
-        result = simulate_dfa_on_line(dfa, token_map, line)
-        tokens.append(result)
+    names, token_ids = classify_lines(automaton, lines)
 
     with open(output_token_path, 'w') as out:
-        for lexeme, token in tokens:
-            out.write(f"<{lexeme}, {token}>\n")
\ No newline at end of file
+        for lexeme, token_id in zip(lines, token_ids):
+            token = names[token_id] if token_id != NO_TOKEN else "erro!"
+            out.write(f"<{lexeme}, {token}>\n")
+    return len(lines)
+
+class PushTokenizer:
+    """
+    Push-style maximal munch tokenizer, for input that arrives in chunks (sockets, pipes).
+
+    Applies the same longest-match logic as tokenize_stream, but the caller hands
+    each chunk to feed() instead of the tokenizer reading it. Only the pending (not
+    yet finished) lexeme is kept between calls, together with the DFA state reached
+    in it, so a lexeme that crosses chunks is never rescanned. Byte chunks are decoded
+    as UTF-8 incrementally (a character may be split between chunks).
+
+    Attributes:
+        automaton (CompiledAFD | LazyAFD): The automaton the tokenizer runs over.
+        skip_whitespace (bool): Whitespace that starts no token is skipped instead of
+                                reported as "erro!".
+        on_error (callable | None): Error sink (see diagnostics).
+        buffer (str): The pending lexeme.
+        base (int): Character offset of buffer[0] in the input.
+        state_key (tuple | None): With a LazyAFD, the NFA states of the DFA state reached
+                                  in the pending lexeme, since the state id itself may be
+                                  reassigned by a flush caused by another tokenizer.
+    """
+    def __init__(self, automaton, skip_whitespace=False, on_error=None):
+        self.automaton = compile_automaton(automaton)
+        self.skip_whitespace = skip_whitespace
+        self.on_error = on_error
+        self.reset()
+
+    def reset(self):
+        """Discards the pending input; the next chunk is the start of a new input."""
+        self.buffer = ''
+        self.base = 0
+        self.state = self.automaton.start_state
+        self.state_key = None
+        self.scanned = 0  # characters of buffer already run through the DFA
+        self.last_token = None
+        self.last_accepting_index = 0
+        self.decoder = None
+        self.line_tracker = LineTracker() if self.on_error is not None else None
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of input.
+
+        Args:
+            chunk (str | bytes): The next chunk (bytes are decoded as UTF-8).
+
+        Returns:
+            List[Tuple[str, str, int]]: The (lexeme, token, offset) tuples completed by
+                                        this chunk; a lexeme that could still grow is
+                                        held back until the next feed() or finish().
+        """
+        if not isinstance(chunk, str):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            chunk = self.decoder.decode(chunk)
+        self.buffer += chunk
+        return self.scan(final=False)
+
+    def finish(self):
+        """
+        Marks the end of the input and resets the tokenizer for a new one.
+
+        Returns:
+            List[Tuple[str, str, int]]: The remaining (lexeme, token, offset) tuples.
+        """
+        if self.decoder is not None:
+            self.buffer += self.decoder.decode(b'', final=True)
+        tokens = self.scan(final=True)
+        self.reset()
+        return tokens
+
+    def scan(self, final):
+        """Tokenizes the buffer, resuming the DFA where the previous call stopped."""
+        automaton = self.automaton
+        table = automaton.table
+        class_map = automaton.class_map
+        num_classes = automaton.num_classes
+        accepting = automaton.accepting
+        state_tokens = automaton.tokens
+        start_state = automaton.start_state
+        on_error = self.on_error
+        line_tracker = self.line_tracker
+
+        buffer = self.buffer
+        base = self.base
+        length = len(buffer)
+        tokens = []
+
+        i = 0
+        state = self.state
+        if self.state_key is not None:
+            state = automaton.state_of(self.state_key)
+        current_index = self.scanned
+        last_token = self.last_token
+        last_accepting_index = self.last_accepting_index
+
+        while i < length:
+            while current_index < length:
+                symbol = buffer[current_index]
+                class_id = class_map.get(symbol)
+                if class_id is None:
+                    class_id = automaton.class_of(symbol)
+                next_state = table[state * num_classes + class_id]
+                if next_state < 0:
+                    break
+
+                state = next_state
+                current_index += 1
+
+                if accepting[state]:
+                    last_token = state_tokens[state]
+                    last_accepting_index = current_index
+
+            if current_index == length and not final:
+                break  # the lexeme may continue in the next chunk
+
+            if last_accepting_index > i:
+                tokens.append((buffer[i:last_accepting_index], last_token or "erro!", base + i))
+                i = last_accepting_index
+            else:
+                if not (self.skip_whitespace and buffer[i].isspace()):
+                    if on_error is not None:
+                        line, column = line_tracker.locate(buffer, i, base)
+                        on_error(LexicalError(base + i, line, column, buffer[i]))
+                    tokens.append((buffer[i], "erro!", base + i))
+                i += 1
+
+            state = start_state
+            last_token = None
+            last_accepting_index = i
+            current_index = i
+
+        if line_tracker is not None:
+            line_tracker.advance(buffer, i, base)
+        self.buffer = buffer[i:]
+        self.base = base + i
+        self.state = state
+        self.state_key = automaton.state_key(state) if isinstance(automaton, LazyAFD) else None
+        self.scanned = current_index - i
+        self.last_token = last_token
+        self.last_accepting_index = last_accepting_index - i
+        return tokens
+
+async def tokenize_async(dfa, token_map, source, chunk_size=DEFAULT_CHUNK_SIZE, skip_whitespace=False, on_error=None):
+    """
+    Tokenizes input read from an asyncio stream or async iterator, with maximal munch.
+
+    This function:
+    - Feeds each chunk to a PushTokenizer, so lexemes that cross chunk boundaries are
+      resumed where they stopped, as in tokenize_stream.
+    - Is an async generator: the next chunk is only awaited once the tokens of the
+      previous one have been consumed, so a slow consumer slows the reads down
+      (and, through the stream's flow control, the sender).
+    - Lets one event loop tokenize many streams concurrently, without threads.
+
+    Parameters:
+        dfa: An AFD (compiled on first use, see compile_automaton), a CompiledAFD or a LazyAFD.
+        token_map: dict mapping accepting DFA states to token names
+        source: an asyncio.StreamReader (or any object with an async read(size) method)
+                or an async iterator of chunks; chunks may be str or UTF-8 bytes
+        chunk_size (int): number of bytes/characters requested per read
+        skip_whitespace (bool): if True, whitespace characters that do not start a
+                                token are skipped instead of reported as "erro!"
+        on_error (callable, optional): error sink (see diagnostics)
+
+    Yields:
+        Tuple[str, str, int]: (lexeme, token, offset), where offset is the character
+                              position of the lexeme in the input.
+    """
+    tokenizer = PushTokenizer(compile_automaton(dfa, token_map), skip_whitespace, on_error)
+    if hasattr(source, 'read'):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                break
+            for token in tokenizer.feed(chunk):
+                yield token
+    else:
+        async for chunk in source:
+            for token in tokenizer.feed(chunk):
+                yield token
+    for token in tokenizer.finish():
+        yield token
+
+class Lexer:
+    """
+    A lexer over a compiled automaton (see lexer_compiler.compile_lexer).
+
+    Attributes:
+        automaton (CompiledAFD): The compiled, minimized automaton the lexer runs over.
+        byte_automaton (CompiledAFD | None): The UTF-8 byte-level automaton, built on the
+                                             first call to tokenize_bytes().
+        on_error (callable | None): Error sink called with a LexicalError for every character
+                                    that starts no token (see diagnostics). Not used by
+                                    classify() and tokenize_file_parallel().
+        skip_whitespace (bool): Skip whitespace that starts no token in feed()/finish().
+        push_tokenizer (PushTokenizer | None): State of the input being fed, if any.
+
+    The automaton is compiled once, so a single Lexer can serve any number of inputs.
+    """
+    def __init__(self, automaton, on_error=None, skip_whitespace=False):
+        self.automaton = compile_automaton(automaton)
+        self.byte_automaton = None
+        self.on_error = on_error
+        self.skip_whitespace = skip_whitespace
+        self.push_tokenizer = None
+
+    def tokenize(self, text):
+        """
+        Tokenizes a whole string, or UTF-8 bytes, with maximal munch.
+
+        Returns:
+            List[Tuple[str, str]]: (lexeme, token) tuples, as simulate_dfa_on_text.
+        """
+        if not isinstance(text, str):
+            text = bytes(text).decode('utf-8', errors='replace')
+        return simulate_dfa_on_text(self.automaton, None, text, self.on_error)
+
+    def feed(self, chunk):
+        """
+        Adds a chunk (str or UTF-8 bytes) of the current input (see PushTokenizer).
+
+        Returns:
+            List[Tuple[str, str, int]]: The (lexeme, token, offset) tuples completed so far.
+        """
+        if self.push_tokenizer is None:
+            self.push_tokenizer = PushTokenizer(self.automaton, self.skip_whitespace, self.on_error)
+        return self.push_tokenizer.feed(chunk)
+
+    def finish(self):
+        """
+        Ends the current input; the next feed() starts a new one.
+
+        Returns:
+            List[Tuple[str, str, int]]: The remaining (lexeme, token, offset) tuples.
+        """
+        if self.push_tokenizer is None:
+            return []
+        tokens = self.push_tokenizer.finish()
+        self.push_tokenizer = None
+        return tokens
+
+    def reset(self):
+        """Discards the input being fed, without tokenizing what is left of it."""
+        self.push_tokenizer = None
+
+    def classify(self, lines):
+        """
+        Checks many independent strings for full acceptance at once (see
+        batch_lexer.classify_lines; vectorized when NumPy is installed).
+
+        Returns:
+            tuple[list[str], Sequence[int]]: The token names and the token id of each
+                                             string (NO_TOKEN if it is rejected).
+        """
+        return classify_lines(compile_automaton(self.automaton), lines)
+
+    def tokenize_bytes(self, data, skip_whitespace=False):
+        """
+        Tokenizes UTF-8 bytes, a memoryview or an mmap without decoding it (see
+        utf8_automaton.tokenize_bytes). Lexemes can be materialized with
+        utf8_automaton.lexeme(data, start, end).
+
+        Returns:
+            List[Tuple[int, int, int]]: (start, end, token_id) tuples; token_id indexes
+                                        token_names() (NO_TOKEN for errors).
+
+        Raises:
+            ValueError: If the automaton is a LazyAFD (see byte_level_automaton).
+        """
+        return tokenize_bytes(self.byte_level_automaton(), data, skip_whitespace, self.on_error)
+
+    def token_names(self):
+        """
+        Returns the token names indexed by the token ids of tokenize_bytes().
+
+        Raises:
+            ValueError: If the automaton is a LazyAFD (see byte_level_automaton).
+        """
+        return self.byte_level_automaton().token_ids()[0]
+
+    def byte_level_automaton(self):
+        """
+        Returns the UTF-8 byte-level automaton, building it on the first call.
+
+        Raises:
+            ValueError: If the automaton is a LazyAFD, whose states are not all known.
+        """
+        if self.byte_automaton is None:
+            if isinstance(self.automaton, LazyAFD):
+                raise ValueError("Byte-level tokenization requires a compiled automaton, not a LazyAFD.")
+            self.byte_automaton = build_byte_automaton(self.automaton)
+        return self.byte_automaton
+
+    def tokenize_stream(self, stream, chunk_size=DEFAULT_CHUNK_SIZE, skip_whitespace=False):
+        """
+        Tokenizes a text stream chunk by chunk (see tokenize_stream).
+
+        Yields:
+            Tuple[str, str, int]: (lexeme, token, offset) tuples.
+        """
+        return tokenize_stream(self.automaton, None, stream, chunk_size, skip_whitespace, self.on_error)
+
+    def incremental(self, text=""):
+        """
+        Tokenizes 'text' and returns an IncrementalLexer, which re-lexes only the
+        tokens affected by each edit (see IncrementalLexer.edit).
+        """
+        return IncrementalLexer(self.automaton, text)
+
+    def tokenize_async(self, source, chunk_size=DEFAULT_CHUNK_SIZE, skip_whitespace=False):
+        """
+        Tokenizes an asyncio.StreamReader or async iterator of chunks (see tokenize_async).
+
+        Yields:
+            Tuple[str, str, int]: (lexeme, token, offset) tuples, from an async generator.
+        """
+        return tokenize_async(self.automaton, None, source, chunk_size, skip_whitespace, self.on_error)
+
+    def tokenize_file_parallel(self, path, workers=None, chunk_bytes=DEFAULT_PARALLEL_CHUNK_BYTES,
+                               delimiters=DEFAULT_DELIMITERS, skip_whitespace=True):
+        """
+        Tokenizes a large UTF-8 file on several processes (see tokenize_file_parallel).
+
+        Yields:
+            Tuple[str, str, int]: (lexeme, token, byte offset) tuples, in file order.
+        """
+        return tokenize_file_parallel(self.automaton, None, path, workers, chunk_bytes, delimiters, skip_whitespace)
+
+    def run(self, input_text_path, output_token_path, streaming=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+        """
+        Tokenizes an input file and writes <lexeme, token> lines to an output file (see run_lexer).
+
+        Returns:
+            int: The number of tokens written.
+        """
+        return run_lexer(self.automaton, None, input_text_path, output_token_path, streaming, chunk_size, workers, self.on_error)
@@ -1,70 +1,70 @@
+import argparse
+import os
 import regular_expression as re
-import syntax_tree as st
-import afn
-import automaton_operations as ao
-from lexer_simulation import run_lexer
-from functools import reduce
+import lexer_cache
+from instrumentation import Profiler, profile_stage
+from lexer_compiler import build_automaton
+from lexer_simulation import Lexer
 
 INPUT_RE_FILE = "../example_input_RE.txt"
 INPUT_USER_FILE = "../example_test_input.txt"
 OUTPUT_TOKEN_LIST_FILE = "../token_list_output.txt"
-
-def main():
+USE_CACHE = True  # reuse the compiled lexer from lexer_cache.CACHE_DIR when the definitions did not change
+EXPORT_DIR = None  # set to e.g. "../" to write each rule's AFD (afd_output_{i}.txt/.bin) for debugging
+WORKERS = None  # set to a process count (0 = one per CPU) to compile the rules in parallel
+LEX_WORKERS = None  # set to a process count (0 = one per CPU) to tokenize the input as a stream, in parallel
+
+def main(profile=False):
+    """
+    Builds the lexer from INPUT_RE_FILE and tokenizes INPUT_USER_FILE.
+
+    Args:
+        profile (bool): Record the time, peak memory and sizes of every stage and print
+                        a report at the end (see instrumentation.Profiler).
+    """
+    profiler = Profiler() if profile else None
     log_step("Starting regular expression to AFD conversion...")
-    regular_expressions = []
     try:
         with open(INPUT_RE_FILE, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
+            definitions = file.read()
+    except FileNotFoundError:
+        print(f"Error: The file '{INPUT_RE_FILE}' was not found.")
+        definitions = ""
+
+    key = lexer_cache.cache_key(definitions)
+    with profile_stage(profiler, "load_cache"):
+        automaton = lexer_cache.load(key) if USE_CACHE else None
+    if automaton is not None:
+        log_step("Compiled lexer loaded from cache, skipping construction.")
+    else:
+        regular_expressions = []
+        try:
+            for line_number, line in enumerate(definitions.splitlines(), start=1):
                 line = line.strip()
                 if line:
                     log_step(f"Parsing regEx {line_number}: {line}")
                 regular_expressions.append(re.RegularExpression.from_definition_line(line))
-    except FileNotFoundError:
-        print(f"Error: The file '{INPUT_RE_FILE}' was not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-    names = []
-    afns = []
-    for i, regex in enumerate(regular_expressions):
-        names.append(regex.name)
+        except Exception as e:
+            print(f"An error occurred: {e}")
 
-        log_step("#1.Tokenize and create postfix format for regular expression")
-        postfix = regex.to_postfix(regex.pattern)
-        log_success("     RegEx to Postfix done.")
-        #log_success(postfix) # --> uncomment this to log on console.
-
-        log_step("#2.Build syntax tree")
-        tree = st.SyntaxTree(postfix)
-        root = tree.build_syntax_tree()
-        log_success("     Build Syntax Tree done.")
-        #tree.log_syntax_tree(root) # --> uncomment this to log on console.
-
-        log_step("#3.Computing nullable, firstpos, lastpos, and followpos")
-        followpos = tree.compute_nullable_first_last_follow(root)
-        log_success("     Nullable, firstpos, lastpos, and followpos done.")
-        #log_success(followpos) # --> uncomment this to log on console.
-
-        log_step("#4.Build AFD")
-        afd = st.build_afd(root, followpos, tree.leaf_positions)
-        afd.export_to_txt(f"../afd_output_{i}.txt")
-        log_success("     AFD built.")
-        log_done(f"../afd_output_{i}.txt")
-
-    for i, name in enumerate(names):
-        afns.append(afn.AFN.load_afd_from_file(f"../afd_output_{i}.txt", token_type=name))
-
-    log_step("#5.Union with epsilon transitions")
-    union_afn = reduce(lambda a1, a2: ao.AutomatonOperations.union(a1, a2), afns)
-    afd, token_map = union_afn.to_afd()
-    log_success("     Union done.")
-    #log_success(afd) # --> uncomment this to log on console.
+        automaton = build_automaton(regular_expressions, EXPORT_DIR, log=log_step, workers=WORKERS,
+                                    profiler=profiler)
+        #log_success(automaton) # --> uncomment this to log on console.
+        if USE_CACHE:
+            lexer_cache.store(key, automaton)
 
     log_step("#6.Lexer Analysis")
-    run_lexer(afd, token_map, INPUT_USER_FILE, OUTPUT_TOKEN_LIST_FILE)
+    with profile_stage(profiler, "lex") as record:
+        record.sizes["tokens"] = Lexer(automaton).run(INPUT_USER_FILE, OUTPUT_TOKEN_LIST_FILE, workers=LEX_WORKERS)
+        record.sizes["input_bytes"] = os.path.getsize(INPUT_USER_FILE)
     log_success("     Token list built.")
     log_done(f"{OUTPUT_TOKEN_LIST_FILE}")
 
+    if profiler is not None:
+        profiler.close()
+        log_step(profiler.report())
+    return profiler
+
 
 def log_step(msg):
     print(f"{msg}")
@@ -83,4 +83,7 @@ def log_done(file):
     print("")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Builds the lexer and tokenizes the example input.")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time, peak memory and sizes of every stage")
+    main(parser.parse_args().profile)
\ No newline at end of file
@@ -0,0 +1,74 @@
+class PositionSet:
+    """
+    Immutable set of syntax tree positions stored as a bitmask relative to its lowest position.
+
+    Bit i of 'mask' stands for position offset + i, so a set only costs as many bits as
+    the span between its lowest and highest positions (a single position costs one bit,
+    wherever it is in the tree). Unions are a shift and a single big-int OR.
+
+    Attributes:
+        offset (int): The lowest position in the set (0 for the empty set).
+        mask (int): The bitmask of positions, relative to 'offset' (bit 0 is always set
+                    unless the set is empty).
+    """
+    __slots__ = ('offset', 'mask')
+
+    def __init__(self, offset=0, mask=0):
+        if mask:
+            low = (mask & -mask).bit_length() - 1
+            offset += low
+            mask >>= low
+        else:
+            offset = 0
+        self.offset = offset
+        self.mask = mask
+
+    @staticmethod
+    def single(position):
+        """Returns the set containing only 'position'."""
+        return PositionSet(position, 1)
+
+    def __or__(self, other):
+        if not other.mask:
+            return self
+        if not self.mask:
+            return other
+        if self.offset <= other.offset:
+            low, high = self, other
+        else:
+            low, high = other, self
+        result = PositionSet.__new__(PositionSet)
+        result.offset = low.offset
+        result.mask = low.mask | (high.mask << (high.offset - low.offset))
+        return result
+
+    def __iter__(self):
+        """Iterates over the positions in increasing order."""
+        bits = bin(self.mask)[:1:-1]  # least significant bit first
+        index = bits.find('1')
+        while index >= 0:
+            yield self.offset + index
+            index = bits.find('1', index + 1)
+
+    def __contains__(self, position):
+        shift = position - self.offset
+        return shift >= 0 and (self.mask >> shift) & 1 == 1
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, PositionSet):
+            return NotImplemented
+        return self.offset == other.offset and self.mask == other.mask
+
+    def __hash__(self):
+        return hash((self.offset, self.mask))
+
+    def __repr__(self):
+        return f"PositionSet({set(self)})"
+
+EMPTY_POSITIONS = PositionSet()
@@ -1,12 +1,11 @@
-import re as re_
-
 class RegularExpression:
     """
     Represents a regular expression definition and provides utilities for processing and transforming it.
 
     This class supports parsing named regular expressions from a definition line,
-    expanding character classes, inserting explicit concatenation symbols, and converting
-    infix regular expressions to postfix (Reverse Polish Notation) format.
+    inserting explicit concatenation symbols, and converting infix regular expressions
+    to postfix (Reverse Polish Notation) format. Character classes (e.g. [a-z], [^"])
+    and escapes (e.g. \\.) are kept as single operand tokens.
 
     Attributes:
         name (str): The name or identifier of the regular expression.
@@ -52,8 +51,8 @@ class RegularExpression:
     
     def is_operand(token):
         return (
-            (token.startswith('[') and token.endswith(']'))  # character class
-            or token.isalnum()  # single letter/digit
+            token not in {'(', ')'}
+            and not RegularExpression.is_operator(token)  # character class, escape or literal
         )
 
     @staticmethod
@@ -67,7 +66,7 @@ class RegularExpression:
         return 0
     
     def starts_expr(token):
-        return token in {'(',} or token.startswith('[') or token.isalnum()
+        return token in {'(',} or RegularExpression.is_operand(token)
 
     def add_concatenation_symbols(self, pattern):
         """
@@ -80,20 +79,8 @@ class RegularExpression:
         Returns:
             str: The updated pattern with '.' for concatenation.
         """
-        i = 0
-
-        def is_character_class(token):
-            return len(token) >= 3 and token[0] == '[' and token[-1] == ']'
-
-        def is_literal(token):
-            return len(token) == 1 and token.isalnum()
-
         def is_operand(token):
-            return (
-                is_character_class(token)
-                or is_literal(token)
-                or token == ')'
-            )
+            return token not in {'(', ')', '|', '.', '*', '+', '?'}
 
         def is_prefix(token):
             return token in ['*', '+', '?']
@@ -104,22 +91,7 @@ class RegularExpression:
         def is_closing_group(token):
             return token == ')'
 
-        def read_token():
-            nonlocal i
-            if pattern[i] == '[':
-                j = i + 1
-                while j < len(pattern) and pattern[j] != ']':
-                    j += 1
-                token = pattern[i:j + 1]
-                i = j + 1
-            else:
-                token = pattern[i]
-                i += 1
-            return token
-
-        tokens = []
-        while i < len(pattern):
-            tokens.append(read_token())
+        tokens = self.tokenize(pattern)
 
         output = []
         for j in range(len(tokens)):
@@ -146,7 +118,7 @@ class RegularExpression:
     def to_postfix(self, pattern):
         """
         Converts an infix regular expression pattern to postfix notation (Reverse Polish Notation),
-        adding explicit concatenation and expanding character classes.
+        adding explicit concatenation. Character classes stay single operand tokens.
 
         Args:
             pattern (str): The infix pattern string.
@@ -154,7 +126,7 @@ class RegularExpression:
         Returns:
             List[str]: A list of tokens representing the postfix expression.
         """
-        pattern = self.add_concatenation_symbols(self.expand_character_classes(pattern))
+        pattern = self.add_concatenation_symbols(pattern)
         output = []
         stack = []
         for token in self.tokenize(pattern):
@@ -181,31 +153,6 @@ class RegularExpression:
         # print("")
         return output
 
-    def expand_character_classes(self, pattern):
-        """
-        Expands character classes (e.g., [a-z]) into explicit alternation format (e.g., (a|b|...|z)).
-
-        Args:
-            pattern (str): The pattern containing character classes.
-
-        Returns:
-            str: The pattern with expanded character classes.
-        """
-        def expand_class(match):
-            chars = []
-            content = match.group(1)
-            i = 0
-            while i < len(content):
-                if i + 2 < len(content) and content[i+1] == '-':
-                    start, end = content[i], content[i+2]
-                    chars.extend([chr(c) for c in range(ord(start), ord(end)+1)])
-                    i += 3
-                else:
-                    chars.append(content[i])
-                    i += 1
-            return '(' + '|'.join(chars) + ')'
-        return re_.sub(r'\[([^\]]+)\]', expand_class, pattern) #TODO: replace re_.sub() for my own method.
-    
     def tokenize(self, pattern):
         """
         Splits the regular expression string into a list of tokens, treating operators,
@@ -223,9 +170,21 @@ class RegularExpression:
             if pattern[i] in {'(', ')', '|', '*', '+', '?', '.'}:
                 tokens.append(pattern[i])
                 i += 1
+            elif pattern[i] == '[':  # character class, kept as a single token
+                j = i + 1
+                while j < len(pattern) and pattern[j] != ']':
+                    j += 2 if pattern[j] == '\\' else 1
+                if j >= len(pattern):
+                    raise ValueError(f"Unterminated character class: {pattern[i:]}")
+                tokens.append(pattern[i:j + 1])
+                i = j + 1
+            elif pattern[i] == '\\' and i + 1 < len(pattern):  # escaped literal
+                j = i + 6 if pattern[i + 1] == 'u' else i + 2
+                tokens.append(pattern[i:j])
+                i = j
             elif not pattern[i].isspace():  # skip space characters
                 tokens.append(pattern[i])  # add non-space characters to the tokens
-                i += 1               
+                i += 1
             else:
                 i += 1
-        return tokens
\ No newline at end of file
+        return tokens
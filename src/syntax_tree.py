@@ -1,5 +1,6 @@
 from afd import AFD
-from collections import deque, defaultdict
+from char_set import CharSet, partition
+from position_set import PositionSet, EMPTY_POSITIONS
 
 class SyntaxTree():
     """
@@ -12,20 +13,51 @@ class SyntaxTree():
     Attributes:
         stack (list): Temporary stack used for building the tree.
         postfix_tokens (list): Tokens in postfix notation representing the regular expression.
-        leaf_positions (dict): Maps leaf node positions to their corresponding symbols.
+        leaf_positions (dict): Maps leaf node positions to their character sets ('#' for the end marker).
+        end_markers (dict): Maps the position of each rule end marker ('#i', see combine_rules)
+                            to the index of its rule.
     """
     def __init__(self, postfix_tokens):
         self.stack = []
         self.postfix_tokens = postfix_tokens
-        self.leaf_positions = {}  # Mapeia posição -> símbolo
+        self.leaf_positions = {}  # Mapeia posição -> conjunto de caracteres
+        self.end_markers = {}  # Mapeia posição do marcador '#i' -> índice da regra
+
+    @staticmethod
+    def combine_rules(postfixes):
+        """
+        Combines the postfix expressions of several rules into (r1#0)|(r2#1)|...
+
+        Each rule keeps its own end marker token '#i' (i = rule index), so that the
+        DFA built from the combined tree knows which rules every state accepts.
+        Leaves of earlier rules get lower positions than those of later rules.
+
+        Args:
+            postfixes (List[List[str]]): Postfix tokens of each rule, as returned by
+                                         RegularExpression.to_postfix (ending in '#', '.').
+
+        Returns:
+            List[str]: The postfix tokens of the combined expression.
+        """
+        combined = []
+        for index, postfix in enumerate(postfixes):
+            if postfix[-2:] != ['#', '.']:
+                raise ValueError("Invalid postfix expression: missing end marker")
+            combined.extend(postfix[:-2])
+            combined.extend([f"#{index}", '.'])
+            if index > 0:
+                combined.append('|')
+        return combined
 
     def build_syntax_tree(self):
         """Constructs the syntax tree from the postfix tokens and returns the root node."""
         position_counter = 1
         for token in self.postfix_tokens:
-            if token.isalnum() or token == '#':
+            if token == '#' or (token[0] == '#' and token[1:].isdigit()):
                 node = Leaf(token, position_counter)
-                self.leaf_positions[position_counter] = token  # <-- adiciona isso
+                self.leaf_positions[position_counter] = '#'  # <-- adiciona isso
+                if len(token) > 1:
+                    self.end_markers[position_counter] = int(token[1:])
                 position_counter += 1
                 self.stack.append(node)
             elif token in ['*', '+', '?']:
@@ -39,8 +71,15 @@ class SyntaxTree():
                 right = self.stack.pop()
                 left = self.stack.pop()
                 self.stack.append(BinaryNode(token, left, right))
-            else:
+            elif token in ['(', ')']:
                 raise ValueError(f"Unknown token: {token}")
+            else:
+                # Literal, escape or whole character class: a single leaf
+                char_set = CharSet.from_token(token)
+                node = Leaf(token, position_counter, char_set)
+                self.leaf_positions[position_counter] = char_set
+                position_counter += 1
+                self.stack.append(node)
 
         if len(self.stack) != 1:
             raise ValueError("Invalid postfix expression")
@@ -48,75 +87,102 @@ class SyntaxTree():
 
     def log_syntax_tree(self, node, indent=0):
         """
-        Recursively logs the syntax tree structure to the console.
+        Logs the syntax tree structure to the console (iteratively, so deep trees do
+        not hit the recursion limit).
 
         Args:
-            node (Node): The current node of the syntax tree.
-            indent (int): The current indentation level (used for formatting).
+            node (Node): The root of the (sub)tree to log.
+            indent (int): The initial indentation level (used for formatting).
         """
-        prefix = "    " * indent
-        if isinstance(node, Leaf):
-            print(f"{prefix}Leaf(symbol='{node.symbol}', position={node.position})")
-        elif isinstance(node, UnaryNode):
-            print(f"{prefix}UnaryNode(operator='{node.symbol}')")
-            self.log_syntax_tree(node.child, indent + 1)
-        elif isinstance(node, BinaryNode):
-            print(f"{prefix}BinaryNode(operator='{node.symbol}')")
-            self.log_syntax_tree(node.left, indent + 1)
-            self.log_syntax_tree(node.right, indent + 1)
-        else:
-            print(f"{prefix}Unknown Node Type")
+        stack = [(node, indent)]
+        while stack:
+            node, indent = stack.pop()
+            prefix = "    " * indent
+            if isinstance(node, Leaf):
+                print(f"{prefix}Leaf(symbol='{node.symbol}', position={node.position}, chars={node.char_set})")
+            elif isinstance(node, UnaryNode):
+                print(f"{prefix}UnaryNode(operator='{node.symbol}')")
+                stack.append((node.child, indent + 1))
+            elif isinstance(node, BinaryNode):
+                print(f"{prefix}BinaryNode(operator='{node.symbol}')")
+                stack.append((node.right, indent + 1))
+                stack.append((node.left, indent + 1))
+            else:
+                print(f"{prefix}Unknown Node Type")
 
 
     def compute_nullable_first_last_follow(self, root):
-        """Computes nullable, firstpos, lastpos, and followpos for all nodes in the tree starting from the given root node."""
+        """
+        Computes nullable, firstpos, lastpos, and followpos for all nodes in the tree starting from the given root node.
+
+        The tree is walked in iterative post-order, so the stack depth does not depend on
+        the size of the pattern. Position sets are PositionSets (relative bitmasks), so
+        unions are big-int ORs. To keep memory bounded on very long patterns, the firstpos
+        and lastpos of a node are released (set to None) once its parent has been computed;
+        only the root keeps them.
+
+        Returns:
+            dict: followpos, mapping each position to the PositionSet of its follow positions.
+        """
         followpos = dict()
+        stack = [(root, False)]
+
+        while stack:
+            node, children_done = stack.pop()
 
-        def traverse(node):
             if isinstance(node, Leaf):
                 node.nullable = False
-                node.firstpos = {node.position}
-                node.lastpos = {node.position}
-                followpos[node.position] = set()
-
-            elif isinstance(node, UnaryNode):
-                traverse(node.child)
+                node.firstpos = PositionSet.single(node.position)
+                node.lastpos = node.firstpos
+                followpos[node.position] = EMPTY_POSITIONS
+                continue
+
+            if not children_done:
+                stack.append((node, True))
+                if isinstance(node, BinaryNode):
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                else:
+                    stack.append((node.child, False))
+                continue
+
+            if isinstance(node, UnaryNode):
+                child = node.child
+                node.firstpos = child.firstpos
+                node.lastpos = child.lastpos
 
                 if node.symbol == '*':
                     node.nullable = True
-                    node.firstpos = node.child.firstpos
-                    node.lastpos = node.child.lastpos
                     for p in node.lastpos:
-                        followpos[p].update(node.firstpos)
+                        followpos[p] |= node.firstpos
                 elif node.symbol == '+':
-                    node.nullable = node.child.nullable
-                    node.firstpos = node.child.firstpos
-                    node.lastpos = node.child.lastpos
+                    node.nullable = child.nullable
                     for p in node.lastpos:
-                        followpos[p].update(node.firstpos)
+                        followpos[p] |= node.firstpos
                 elif node.symbol == '?':
                     node.nullable = True
-                    node.firstpos = node.child.firstpos
-                    node.lastpos = node.child.lastpos
+
+                child.firstpos = child.lastpos = None
 
             elif isinstance(node, BinaryNode):
-                traverse(node.left)
-                traverse(node.right)
+                left, right = node.left, node.right
 
                 if node.symbol == '.':
-                    node.nullable = node.left.nullable and node.right.nullable
-                    node.firstpos = node.left.firstpos if not node.left.nullable else node.left.firstpos | node.right.firstpos
-                    node.lastpos = node.right.lastpos if not node.right.nullable else node.left.lastpos | node.right.lastpos
+                    node.nullable = left.nullable and right.nullable
+                    node.firstpos = left.firstpos if not left.nullable else left.firstpos | right.firstpos
+                    node.lastpos = right.lastpos if not right.nullable else left.lastpos | right.lastpos
 
-                    for p in node.left.lastpos:
-                        followpos[p].update(node.right.firstpos)
+                    for p in left.lastpos:
+                        followpos[p] |= right.firstpos
 
                 elif node.symbol == '|':
-                    node.nullable = node.left.nullable or node.right.nullable
-                    node.firstpos = node.left.firstpos | node.right.firstpos
-                    node.lastpos = node.left.lastpos | node.right.lastpos
+                    node.nullable = left.nullable or right.nullable
+                    node.firstpos = left.firstpos | right.firstpos
+                    node.lastpos = left.lastpos | right.lastpos
+
+                left.firstpos = left.lastpos = None
+                right.firstpos = right.lastpos = None
 
-        traverse(root)
         return followpos
 
 class Node:
@@ -126,14 +192,18 @@ class Node:
     Attributes:
         symbol (str): The symbol represented by the node (operator or terminal).
         nullable (bool): Whether the subtree rooted at this node can derive the empty string.
-        firstpos (set): Set of positions that can appear first in a string derived from this node.
-        lastpos (set): Set of positions that can appear last in a string derived from this node.
+        firstpos (PositionSet): Positions that can appear first in a string derived from this node.
+        lastpos (PositionSet): Positions that can appear last in a string derived from this node.
+
+    Nodes use __slots__ (no per-instance dict) to keep large trees compact.
     """
+    __slots__ = ('symbol', 'nullable', 'firstpos', 'lastpos')
+
     def __init__(self, symbol):
         self.symbol = symbol
         self.nullable = False
-        self.firstpos = set()
-        self.lastpos = set()
+        self.firstpos = EMPTY_POSITIONS
+        self.lastpos = EMPTY_POSITIONS
 
 class Leaf(Node):
     """
@@ -143,12 +213,16 @@ class Leaf(Node):
         Node
 
     Attributes:
-        symbol (str): The terminal symbol (character) this leaf represents.
+        symbol (str): The terminal token this leaf represents (a character, escape or character class).
         position (int): A unique position number assigned to the leaf for use in followpos calculations.
+        char_set (CharSet | None): The characters matched by this leaf (None for the '#' end marker).
     """
-    def __init__(self, symbol, position):
+    __slots__ = ('position', 'char_set')
+
+    def __init__(self, symbol, position, char_set=None):
         super().__init__(symbol)
         self.position = position
+        self.char_set = char_set
 
 class UnaryNode(Node):
     """
@@ -161,6 +235,8 @@ class UnaryNode(Node):
         symbol (str): The unary operator.
         child (Node): The single child node of this unary operator.
     """
+    __slots__ = ('child',)
+
     def __init__(self, symbol, child):
         super().__init__(symbol)
         self.child = child
@@ -177,6 +253,8 @@ class BinaryNode(Node):
         left (Node): The left operand subtree.
         right (Node): The right operand subtree.
     """
+    __slots__ = ('left', 'right')
+
     def __init__(self, symbol, left, right):
         super().__init__(symbol)
         self.left = left
@@ -188,11 +266,12 @@ def build_afd(root, followpos, leaf_positions):
 
     Args:
         root (Node): The root of the syntax tree.
-        followpos (dict): A dictionary mapping position integers to sets of follow positions.
-        leaf_positions (dict): A dictionary mapping positions to their respective terminal symbols.
+        followpos (dict): A dictionary mapping position integers to PositionSets of follow positions.
+        leaf_positions (dict): A dictionary mapping positions to their character sets ('#' for the end marker).
 
     Returns:
         AFD: An instance of the AFD class representing the deterministic finite automaton.
+             States are integer ids 0..N-1, with 0 as the start state.
 
     Raises:
         ValueError: If the special terminal symbol '#' is not found in the leaf positions.
@@ -207,58 +286,112 @@ def build_afd(root, followpos, leaf_positions):
     if hash_position is None:
         raise ValueError("Character '#' not found in RE.")
 
-    # initial state: root firstpos
-    start_state = frozenset(root.firstpos)
-    dstates = [start_state]
-    unmarked_states = deque([start_state])
-    transitions = {}
+    dstates, transitions = compute_dstates(root, followpos, leaf_positions)
     accept_states = set()
 
-    while unmarked_states:
-        current = unmarked_states.popleft()
-        transitions[current] = {}
+    for state_id, positions in enumerate(dstates):
+        if hash_position in positions:
+            accept_states.add(state_id)
 
-        symbol_to_positions = defaultdict(set)
+    return AFD(0, accept_states, transitions)
 
-        for pos in current:
-            symbol = leaf_positions[pos]
-            if symbol == '#':
-                continue  # ignorar o símbolo especial
-            for follow in followpos.get(pos, []):
-                symbol_to_positions[symbol].add(follow)
+def build_tokenizing_afd(root, followpos, leaf_positions, end_markers, token_names):
+    """
+    Constructs the final tokenizing AFD of several rules in a single pass, from the
+    combined syntax tree (r1#0)|(r2#1)|... (see SyntaxTree.combine_rules).
 
-        for symbol, new_positions in symbol_to_positions.items():
-            new_state = frozenset(new_positions)
-            if new_state not in dstates:
-                dstates.append(new_state)
-                unmarked_states.append(new_state)
-            transitions[current][symbol] = new_state
+    A state is accepting when it contains the end marker of at least one rule, and
+    resolves to the token of the highest-priority (lowest index) rule among them.
+
+    Args:
+        root (Node): The root of the combined syntax tree.
+        followpos (dict): A dictionary mapping position integers to PositionSets of follow positions.
+        leaf_positions (dict): A dictionary mapping positions to their character sets ('#' for end markers).
+        end_markers (dict): A dictionary mapping end marker positions to rule indices.
+        token_names (List[str]): The token name of each rule, in rule order.
+
+    Returns:
+        AFD: The tokenizing automaton (integer states, 0 is the start state), with token_map
+             mapping each accepting state to its token.
+
+    Raises:
+        ValueError: If the tree has no rule end markers.
+    """
+    if not end_markers:
+        raise ValueError("No rule end markers ('#i') found in RE.")
+
+    dstates, transitions = compute_dstates(root, followpos, leaf_positions)
+    accept_states = set()
+    token_map = {}
+    for state_id, positions in enumerate(dstates):
+        rules = [end_markers[pos] for pos in positions if pos in end_markers]
+        if rules:
+            accept_states.add(state_id)
+            token_map[state_id] = token_names[min(rules)]
 
-    for state in dstates:
-        if hash_position in state:
-            accept_states.add(state)
+    return AFD(0, accept_states, transitions, token_map)
 
-    return AFD(start_state, accept_states, transitions)
+def compute_dstates(root, followpos, leaf_positions):
+    """
+    Runs the followpos subset construction shared by build_afd and build_tokenizing_afd.
+
+    Args:
+        root (Node): The root of the syntax tree.
+        followpos (dict): A dictionary mapping position integers to PositionSets of follow positions.
+        leaf_positions (dict): A dictionary mapping positions to their character sets ('#' for end markers).
+
+    Returns:
+        tuple: (dstates, transitions), where dstates[i] is the PositionSet of state i
+               and transitions maps state ids to {symbol: target id}. State 0 is the start state.
+    """
+    # initial state: root firstpos
+    dstates = [root.firstpos]
+    state_ids = {root.firstpos: 0}  # PositionSet -> state id
+    transitions = {}
+
+    # States are discovered in order, so dstates doubles as the work queue
+    current_id = 0
+    while current_id < len(dstates):
+        current = dstates[current_id]
+        current_transitions = transitions[current_id] = {}
+
+        # Split the character sets of the current positions into disjoint ranges;
+        # each range leads to the union of followpos of the positions covering it.
+        positions = [pos for pos in current if leaf_positions[pos] != '#']  # ignorar o símbolo especial
+        for symbol, members in partition([leaf_positions[pos] for pos in positions]):
+            new_state = EMPTY_POSITIONS
+            for index in members:
+                new_state |= followpos.get(positions[index], EMPTY_POSITIONS)
+            target_id = state_ids.get(new_state)
+            if target_id is None:
+                target_id = state_ids[new_state] = len(dstates)
+                dstates.append(new_state)
+            current_transitions[symbol] = target_id
+        current_id += 1
+
+    return dstates, transitions
 
 def find_leaf_by_position(node, pos):
     """
-    Recursively searches for a leaf node with the given position in the syntax tree.
+    Searches for a leaf node with the given position in the syntax tree (depth-first,
+    left to right, using an explicit stack).
 
     Args:
-        node (Node): The current node to search in.
+        node (Node): The root of the (sub)tree to search in.
         pos (int): The target position number to find.
 
     Returns:
         Leaf or None: The leaf node with the specified position, or None if not found.
     """
-    if isinstance(node, Leaf):
-        if node.position == pos:
-            return node
-    elif isinstance(node, UnaryNode):
-        return find_leaf_by_position(node.child, pos)
-    elif isinstance(node, BinaryNode):
-        left_result = find_leaf_by_position(node.left, pos)
-        if left_result:
-            return left_result
-        return find_leaf_by_position(node.right, pos)
-    return None
\ No newline at end of file
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Leaf):
+            if node.position == pos:
+                return node
+        elif isinstance(node, UnaryNode):
+            stack.append(node.child)
+        elif isinstance(node, BinaryNode):
+            stack.append(node.right)
+            stack.append(node.left)
+    return None
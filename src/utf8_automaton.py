@@ -0,0 +1,206 @@
+from afn import AFN
+from char_set import CharSet
+from compiled_afd import CompiledAFD, NO_TOKEN
+from automaton_operations import AutomatonOperations
+from diagnostics import LexicalError, LineTracker
+
+MAX_UTF8_CODE_POINTS = (0x7F, 0x7FF, 0xFFFF, 0x10FFFF)  # last code point of each UTF-8 length
+SURROGATES = (0xD800, 0xDFFF)  # not encodable in UTF-8
+WHITESPACE_BYTES = frozenset(b' \t\n\r\f\v')
+
+def utf8_sequences(low, high):
+    """
+    Splits a code point range into UTF-8 byte range sequences.
+
+    Every code point in [low, high] (surrogates excepted) is encoded by exactly one of
+    the returned sequences, and every byte string matched by a sequence is the UTF-8
+    encoding of a code point in the range.
+
+    Args:
+        low (int): The first code point of the range.
+        high (int): The last code point of the range.
+
+    Returns:
+        list[list[tuple[int, int]]]: Sequences of inclusive (low, high) byte ranges.
+
+    E.g.: utf8_sequences(0x41, 0xE9) -> [[(0x41, 0x7F)], [(0xC2, 0xC2), (0x80, 0xBF)], [(0xC3, 0xC3), (0x80, 0xA9)]]
+    """
+    sequences = []
+    pending = [(low, high)]
+    while pending:
+        low, high = pending.pop()
+
+        # Surrogates have no encoding
+        if low <= SURROGATES[1] and high >= SURROGATES[0]:
+            if high > SURROGATES[1]:
+                pending.append((SURROGATES[1] + 1, high))
+            if low < SURROGATES[0]:
+                pending.append((low, SURROGATES[0] - 1))
+            continue
+
+        # Both ends must have the same encoded length
+        split = next((limit for limit in MAX_UTF8_CODE_POINTS if low <= limit < high), None)
+        if split is not None:
+            pending.append((split + 1, high))
+            pending.append((low, split))
+            continue
+
+        if high <= MAX_UTF8_CODE_POINTS[0]:
+            sequences.append([(low, high)])
+            continue
+
+        # Split until every continuation byte below the first differing one spans its full range
+        length = len(chr(low).encode('utf-8'))
+        for index in range(1, length):
+            mask = (1 << (6 * index)) - 1
+            if low & ~mask != high & ~mask:
+                if low & mask:
+                    pending.append(((low | mask) + 1, high))
+                    pending.append((low, low | mask))
+                    break
+                if high & mask != mask:
+                    pending.append((high & ~mask, high))
+                    pending.append((low, (high & ~mask) - 1))
+                    break
+        else:
+            sequences.append(list(zip(chr(low).encode('utf-8'), chr(high).encode('utf-8'))))
+    return sequences
+
+def build_byte_automaton(automaton):
+    """
+    Converts a CompiledAFD over characters into an equivalent CompiledAFD over UTF-8 bytes.
+
+    Every transition of the character automaton is replaced by the byte sequences of
+    its class (see utf8_sequences), through intermediate states; suffixes that lead to
+    the same target are shared. The per-state byte NFA is then determinized with
+    AFN.to_afd and minimized, so the result can be scanned one byte at a time with
+    class_of(chr(byte)) and the same transition table layout.
+
+    Args:
+        automaton (CompiledAFD): The character-level automaton.
+
+    Returns:
+        CompiledAFD: The byte-level automaton, with the same tokens.
+    """
+    num_classes = automaton.num_classes
+    class_sequences = [
+        [sequence for low, high in char_set.ranges for sequence in utf8_sequences(low, high)]
+        for char_set in automaton.class_char_sets()
+    ]
+
+    states = set(range(automaton.num_states))
+    transitions = {}
+    suffix_nodes = {}  # (byte range suffix, target) -> intermediate state
+
+    def add_transition(source, byte_range, dest):
+        symbol = CharSet([byte_range])
+        transitions.setdefault(source, {}).setdefault(symbol, set()).add(dest)
+
+    def suffix_node(suffix, target):
+        """Returns the state from which 'suffix' leads to 'target', creating its chain once."""
+        node = suffix_nodes.get((suffix, target))
+        if node is None:
+            node = suffix_nodes[(suffix, target)] = len(states)
+            states.add(node)
+            rest = suffix[1:]
+            add_transition(node, suffix[0], suffix_node(rest, target) if rest else target)
+        return node
+
+    for state in range(automaton.num_states):
+        for class_id in range(1, num_classes):
+            target = automaton.table[state * num_classes + class_id]
+            if target < 0:
+                continue
+            for sequence in class_sequences[class_id]:
+                rest = tuple(sequence[1:])
+                add_transition(state, sequence[0], suffix_node(rest, target) if rest else target)
+
+    final_states = {s for s in range(automaton.num_states) if automaton.accepting[s]}
+    token_types = {s: automaton.tokens[s] for s in final_states if automaton.tokens[s] is not None}
+    alphabet = {symbol for trans in transitions.values() for symbol in trans}
+    byte_nfa = AFN(states, automaton.start_state, final_states, transitions, alphabet, token_types)
+
+    afd, token_map = byte_nfa.to_afd()
+    return AutomatonOperations.minimize(CompiledAFD.from_afd(afd, token_map))
+
+def utf8_length(lead):
+    """Returns the length of the UTF-8 sequence starting with byte 'lead' (1 if invalid)."""
+    if 0xC0 <= lead < 0xE0:
+        return 2
+    if 0xE0 <= lead < 0xF0:
+        return 3
+    if 0xF0 <= lead < 0xF8:
+        return 4
+    return 1
+
+def tokenize_bytes(automaton, data, skip_whitespace=False, on_error=None):
+    """
+    Tokenizes UTF-8 input with maximal munch, without decoding it.
+
+    This function:
+    - Scans 'data' byte by byte over a byte-level automaton (see build_byte_automaton).
+    - Returns offsets instead of lexemes, so no string is created per token;
+      use lexeme() to materialize the ones that are needed.
+    - Reports a character that starts no token as one error token (NO_TOKEN) spanning
+      its whole UTF-8 sequence.
+
+    Parameters:
+        automaton (CompiledAFD): The byte-level automaton.
+        data: bytes, bytearray, memoryview (of unsigned bytes) or mmap object.
+        skip_whitespace (bool): if True, ASCII whitespace bytes that do not start a
+                                token are skipped instead of reported as errors.
+        on_error (callable, optional): error sink, called with a LexicalError (byte offset
+                                       and column) for every error token (see diagnostics).
+
+    Returns:
+        List[Tuple[int, int, int]]: (start, end, token_id) tuples, where token_id indexes
+                                    the names returned by automaton.token_ids(), or is NO_TOKEN.
+    """
+    byte_classes = [automaton.class_of(chr(byte)) for byte in range(256)]
+    _, state_token_ids = automaton.token_ids()
+    table = automaton.table
+    num_classes = automaton.num_classes
+    accepting = automaton.accepting
+    start_state = automaton.start_state
+    line_tracker = LineTracker() if on_error is not None else None
+
+    i = 0
+    length = len(data)
+    tokens = []
+
+    while i < length:
+        state = start_state
+        last_token = NO_TOKEN
+        last_accepting_index = i
+        current_index = i
+
+        while current_index < length:
+            next_state = table[state * num_classes + byte_classes[data[current_index]]]
+            if next_state < 0:
+                break
+
+            state = next_state
+            current_index += 1
+
+            if accepting[state]:
+                last_token = state_token_ids[state]
+                last_accepting_index = current_index
+
+        if last_accepting_index > i:
+            tokens.append((i, last_accepting_index, last_token))
+            i = last_accepting_index
+        elif skip_whitespace and data[i] in WHITESPACE_BYTES:
+            i += 1
+        else:
+            end = min(i + utf8_length(data[i]), length)
+            if on_error is not None:
+                line, column = line_tracker.locate(data, i)
+                on_error(LexicalError(i, line, column, lexeme(data, i, end)))
+            tokens.append((i, end, NO_TOKEN))
+            i = end
+
+    return tokens
+
+def lexeme(data, start, end):
+    """Decodes the lexeme data[start:end] (invalid UTF-8 is replaced, not raised)."""
+    return bytes(data[start:end]).decode('utf-8', errors='replace')
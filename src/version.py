@@ -0,0 +1,3 @@
+# Tool version. Bump it whenever the compiled automaton format or the construction
+# pipeline changes, so that cached automata built by older versions are rebuilt.
+__version__ = "1.2.0"
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# The modules live flat in src/ and import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from lexer_compiler import compile_lexer
+from lexer_simulation import simulate_dfa_on_text
+
+DEFINITIONS = ["id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [1-9]([0-9])* | 0", "op: \\+ | \\+\\+\\+="]
+
+def expected_tokens(text):
+    """Returns the (lexeme, token, offset) tokens of 'text' from simulate_dfa_on_text over DEFINITIONS."""
+    tokens = []
+    offset = 0
+    for lexeme, token in simulate_dfa_on_text(compile_lexer(DEFINITIONS).automaton, None, text):
+        tokens.append((lexeme, token, offset))
+        offset += len(lexeme)
+    return tokens
@@ -0,0 +1,100 @@
+import asyncio
+import regular_expression as re
+from conftest import DEFINITIONS, expected_tokens
+from lexer_compiler import build_automaton, compile_lexer
+from lexer_simulation import Lexer
+
+def reader_with(chunks):
+    """Returns a StreamReader fed with 'chunks' (bytes) and then EOF."""
+    reader = asyncio.StreamReader()
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    return reader
+
+async def collect(lexer, source, chunk_size):
+    return [token async for token in lexer.tokenize_async(source, chunk_size)]
+
+def test_tokens_split_across_reads():
+    lexer = compile_lexer(DEFINITIONS)
+
+    async def run():
+        return await collect(lexer, reader_with(["alpha12 +++= é".encode('utf-8')]), chunk_size=3)
+
+    tokens = asyncio.run(run())
+    assert tokens == expected_tokens("alpha12 +++= é")
+    assert ("alpha12", "id", 0) in tokens and ("+++=", "op", 8) in tokens
+
+def test_eof_inside_a_token_and_error_token():
+    lexer = compile_lexer(DEFINITIONS)
+
+    async def chunks():
+        for chunk in ("12 @a", "b", "c ++", "+"):  # EOF inside a "+++=" that never completes
+            yield chunk
+
+    tokens = asyncio.run(collect(lexer, chunks(), chunk_size=4))
+    assert tokens == [("12", "num", 0), (" ", "erro!", 2), ("@", "erro!", 3), ("abc", "id", 4),
+                      (" ", "erro!", 7), ("+", "op", 8), ("+", "op", 9), ("+", "op", 10)]
+
+def test_concurrent_streams_share_one_lexer():
+    texts = [f"x{i} {i + 1} +++= y{i}z" * 20 for i in range(8)]
+    for lazy in (False, True):
+        if lazy:
+            rules = [re.RegularExpression.from_definition_line(line) for line in DEFINITIONS]
+            lexer = Lexer(build_automaton(rules, lazy=True, max_states=3))
+        else:
+            lexer = compile_lexer(DEFINITIONS)
+
+        async def stream(text):
+            reader = asyncio.StreamReader()
+
+            async def produce():
+                data = text.encode('utf-8')
+                for start in range(0, len(data), 5):
+                    reader.feed_data(data[start:start + 5])
+                    await asyncio.sleep(0)  # let the other streams run between chunks
+                reader.feed_eof()
+
+            producer = asyncio.ensure_future(produce())
+            tokens = await collect(lexer, reader, chunk_size=4)
+            await producer
+            return tokens
+
+        async def run():
+            return await asyncio.gather(*(stream(text) for text in texts))
+
+        results = asyncio.run(run())
+        assert results == [expected_tokens(text) for text in texts]
+
+def test_tokens_over_a_tcp_connection():
+    lexer = compile_lexer(DEFINITIONS)
+    text = "alpha12 +++= é 42 beta ++ 0" * 50
+
+    async def echo(reader, writer):
+        while data := await reader.read(7):
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(echo, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def send():
+            data = text.encode('utf-8')
+            for start in range(0, len(data), 5):
+                writer.write(data[start:start + 5])
+                await writer.drain()
+            writer.write_eof()
+
+        sender = asyncio.ensure_future(send())
+        tokens = await collect(lexer, reader, chunk_size=4)
+        await sender
+        writer.close()
+        await writer.wait_closed()
+        server.close()
+        await server.wait_closed()
+        return tokens
+
+    assert asyncio.run(run()) == expected_tokens(text)
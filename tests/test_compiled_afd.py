@@ -0,0 +1,35 @@
+import struct
+import pytest
+from compiled_afd import BINARY_HEADER, CompiledAFD
+from lexer_cache import load, store
+from lexer_compiler import compile_lexer
+
+def test_binary_round_trip():
+    automaton = compile_lexer(["id: [a-z]+", "num: [0-9]+"]).automaton
+    loaded = CompiledAFD.from_buffer(automaton.to_bytes())
+    assert list(loaded.table) == list(automaton.table)
+    assert loaded.tokens == automaton.tokens
+
+def test_truncated_or_corrupt_buffer_is_rejected(tmp_path):
+    data = compile_lexer(["id: [a-z]+", "num: [0-9]+"]).automaton.to_bytes()
+    for size in (len(data) - 1, BINARY_HEADER.size + 4):
+        with pytest.raises(ValueError):
+            CompiledAFD.from_buffer(data[:size])
+    with pytest.raises(ValueError):
+        CompiledAFD.from_buffer(data + b"\0")
+
+    # Point the first state with a token past the token names
+    _, _, num_states, num_classes, *_ = BINARY_HEADER.unpack_from(data)
+    token_ids = BINARY_HEADER.size + 4 * num_states * num_classes
+    ids = struct.unpack_from(f'<{num_states}i', data, token_ids)
+    state = next(state for state, token_id in enumerate(ids) if token_id >= 0)
+    corrupt = bytearray(data)
+    struct.pack_into('<i', corrupt, token_ids + 4 * state, 99)
+    with pytest.raises(ValueError):
+        CompiledAFD.from_buffer(corrupt)
+
+    # A truncated cache entry is a cache miss
+    store("key", CompiledAFD.from_buffer(data), cache_dir=tmp_path)
+    path = next(tmp_path.iterdir())
+    path.write_bytes(path.read_bytes()[:-3])
+    assert load("key", cache_dir=tmp_path) is None
@@ -0,0 +1,30 @@
+import random
+from lexer_compiler import compile_lexer
+from lexer_simulation import simulate_dfa_on_text
+
+DEFINITIONS = ["id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [1-9]([0-9])* | 0", "op: \\+ | \\+\\+\\+=",
+               "s: \"[^\"]*\"", "w: [ \\n]+", "long: ab*c"]
+PIECES = ['a', 'b', 'c', 'x1', '0', '12', ' ', '+', '++', '=', '"', 'é', '\n', '@', 'abbb']
+
+def test_random_edits_match_full_relexing():
+    lexer = compile_lexer(DEFINITIONS)
+    rng = random.Random(3)
+    for _ in range(100):
+        document = lexer.incremental(''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 40))))
+        for _ in range(20):
+            start = rng.randint(0, len(document.text))
+            end = rng.randint(start, min(len(document.text), start + 6))
+            old = list(document)
+            first, removed, inserted = document.edit(start, end, ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 3))))
+
+            tokens = list(document)
+            assert [(lexeme, token) for lexeme, token, _ in tokens] == simulate_dfa_on_text(lexer.automaton, None, document.text)
+            assert tokens[:first] == old[:first]
+            assert len(tokens) - inserted == len(old) - removed
+
+def test_lookahead_shrinks_once_a_long_scan_is_relexed():
+    document = compile_lexer(DEFINITIONS).incremental("abc x12 " * 50)
+    document.edit(4, 4, '"')  # unterminated string, scanned to the end of the text
+    assert document.max_lookahead() > 300
+    document.edit(6, 6, '"')
+    assert document.max_lookahead() == 1
@@ -0,0 +1,26 @@
+from instrumentation import Profiler
+from lexer_compiler import build_automaton, parse_definitions
+
+DEFINITIONS = ["id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [1-9]([0-9])* | 0"]
+
+def test_single_pass_rules_are_sized_not_timed():
+    profiler = Profiler(trace_memory=False)
+    build_automaton(parse_definitions(DEFINITIONS), profiler=profiler)
+    shares = [record for record in profiler.records if record.rule is not None]
+    assert [record.rule for record in shares] == ["id", "num"]
+    assert all(record.seconds is None and record.sizes["followpos_entries"] > 0 for record in shares)
+    assert profiler.by_rule() == []
+    assert "Largest rules by followpos_entries" in profiler.report()
+
+def test_per_rule_build_times_every_rule():
+    profiler = Profiler(trace_memory=False)
+    build_automaton(parse_definitions(DEFINITIONS), single_pass=False, profiler=profiler)
+    assert sorted(rule for rule, _ in profiler.by_rule()) == ["id", "num"]
+    assert "Most expensive rules" in profiler.report()
+
+def test_on_record_sees_the_token_rate():
+    seen = []
+    profiler = Profiler(trace_memory=False, on_record=lambda record: seen.append(dict(record.sizes)))
+    with profiler.stage("lex") as record:
+        record.sizes["tokens"] = 10
+    assert seen[0]["tokens"] == 10 and seen[0]["tokens_per_second"] > 0
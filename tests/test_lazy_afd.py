@@ -0,0 +1,37 @@
+import pytest
+import regular_expression as re
+from conftest import DEFINITIONS, expected_tokens
+from lexer_compiler import build_automaton, compile_lexer
+from lexer_simulation import Lexer, PushTokenizer, simulate_dfa_on_text
+
+TEXT = "alpha123 +++= 42 ++ beta"
+
+def lazy_automaton(max_states):
+    rules = [re.RegularExpression.from_definition_line(line) for line in DEFINITIONS]
+    return build_automaton(rules, lazy=True, max_states=max_states)
+
+def test_lazy_automaton_matches_compiled():
+    automaton = lazy_automaton(max_states=3)
+    assert simulate_dfa_on_text(automaton, None, TEXT) == compile_lexer(DEFINITIONS).tokenize(TEXT)
+
+def test_flush_in_the_middle_of_a_stream():
+    automaton = lazy_automaton(max_states=2)
+    first = PushTokenizer(automaton)
+    second = PushTokenizer(automaton)
+    tokens = []
+    for char in TEXT:
+        tokens += first.feed(char)
+        # The other stream walks other states, flushing the shared cache between chunks
+        second.feed("9+")
+    tokens += first.finish()
+    second.finish()
+
+    assert automaton.flushes > 0
+    assert tokens == expected_tokens(TEXT)
+
+def test_byte_mode_rejects_lazy_automaton():
+    lexer = Lexer(lazy_automaton(max_states=10))
+    with pytest.raises(ValueError):
+        lexer.tokenize_bytes(b"alpha")
+    with pytest.raises(ValueError):
+        lexer.token_names()
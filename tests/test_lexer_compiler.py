@@ -0,0 +1,26 @@
+import regular_expression as re
+from instrumentation import Profiler
+from lexer_compiler import build_combined_afd, compile_lexer
+from lexer_simulation import compile_automaton, simulate_dfa_on_text
+
+DEFINITIONS = ["if: if", "id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [1-9]([0-9])* | 0"]
+TEXT = "if iffy x1 42 0 @"
+
+def test_build_modes_agree():
+    expected = compile_lexer(DEFINITIONS).tokenize(TEXT)
+    assert compile_lexer(DEFINITIONS, single_pass=False).tokenize(TEXT) == expected
+    assert compile_lexer(DEFINITIONS, single_pass=False, workers=2).tokenize(TEXT) == expected
+    assert compile_lexer(DEFINITIONS, lazy=True).tokenize(TEXT) == expected
+
+def test_workers_compile_rules_in_a_pool():
+    profiler = Profiler(trace_memory=False)
+    lexer = compile_lexer(DEFINITIONS, workers=2, profiler=profiler)
+    assert any(record.name == "compile_rules_parallel" for record in profiler.records)
+    assert lexer.tokenize(TEXT) == compile_lexer(DEFINITIONS).tokenize(TEXT)
+
+def test_afd_is_compiled_once():
+    afd = build_combined_afd([re.RegularExpression.from_definition_line(line) for line in DEFINITIONS])
+    automaton = compile_automaton(afd)
+    assert compile_automaton(afd) is automaton
+    assert simulate_dfa_on_text(afd, None, TEXT) == compile_lexer(DEFINITIONS).tokenize(TEXT)
+    assert compile_automaton(afd) is automaton
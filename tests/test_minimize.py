@@ -0,0 +1,19 @@
+from array import array
+from automaton_operations import AutomatonOperations
+from compiled_afd import CompiledAFD
+from lexer_compiler import compile_lexer
+
+def test_pathological_rule_is_minimal():
+    # (a|b)*a(a|b)^n needs 2^(n+1) states
+    lexer = compile_lexer(["w: (a|b)*a" + "(a|b)" * 3])
+    assert lexer.automaton.num_states == 2 ** 4
+
+def test_long_chain_keeps_every_state():
+    n = 5000
+    table = array('i', [-1, -1] * n)
+    for state in range(n - 1):
+        table[state * 2 + 1] = state + 1
+    accepting = [0] * (n - 1) + [1]
+    tokens = [None] * (n - 1) + ["x"]
+    chain = CompiledAFD(n, 2, [0, ord('a'), ord('a') + 1], [0, 1, 0], table, accepting, tokens)
+    assert AutomatonOperations.minimize(chain).num_states == n
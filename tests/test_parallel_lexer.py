@@ -0,0 +1,25 @@
+import random
+from lexer_compiler import compile_lexer
+from lexer_simulation import find_resync_points, tokenize_file_parallel, tokenize_stream
+
+DEFINITIONS = ["id: [a-zA-Z]([a-zA-Z] | [0-9])*", "num: [1-9]([0-9])* | 0", "s: \"[^\"]*\""]
+
+def test_parallel_matches_stream(tmp_path):
+    lexer = compile_lexer(DEFINITIONS)
+    rng = random.Random(0)
+    path = tmp_path / "input.txt"
+    path.write_bytes(''.join(rng.choice(['ab', 'x1', '0', '42', ' ', '\n', '\t', '"', 'é', '@'])
+                             for _ in range(5000)).encode('utf-8'))
+    with open(path, encoding='utf-8', newline='') as f:
+        expected = [(lexeme, token) for lexeme, token, _ in tokenize_stream(lexer.automaton, None, f, skip_whitespace=True)]
+    data = path.read_bytes()
+    for chunk_bytes in (7, 100, 5000):
+        for delimiters in (b'\n', b'\n\t'):
+            tokens = list(tokenize_file_parallel(lexer.automaton, None, str(path), 2, chunk_bytes, delimiters))
+            assert [(lexeme, token) for lexeme, token, _ in tokens] == expected
+            assert all(data[offset:].startswith(lexeme.encode('utf-8')) for lexeme, _, offset in tokens)
+
+def test_resync_points_follow_the_first_delimiter(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_bytes(b'ab]c^d-e' * 10)
+    assert find_resync_points(str(path), 5, b']^-') == [0, 7, 13, 19, 27, 35, 43, 51, 59, 67, 75, 80]